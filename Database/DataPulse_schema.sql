@@ -181,3 +181,68 @@ DESC customer_mapping;
 Desc sales;
 
 
+
+-- Incremental preprocessing: rows are flagged once normalized and reset on edit
+ALTER TABLE customers_raw ADD COLUMN is_cleaned TINYINT(1) NOT NULL DEFAULT 0;
+ALTER TABLE products_raw ADD COLUMN is_cleaned TINYINT(1) NOT NULL DEFAULT 0;
+ALTER TABLE sales_raw ADD COLUMN is_cleaned TINYINT(1) NOT NULL DEFAULT 0;
+
+CREATE INDEX idx_customers_raw_cleaned ON customers_raw (is_cleaned, customer_id);
+CREATE INDEX idx_products_raw_cleaned ON products_raw (is_cleaned, product_id);
+CREATE INDEX idx_sales_raw_cleaned ON sales_raw (is_cleaned, sale_id);
+
+-- Resumable migration: last committed raw id per stage, removed when the stage completes
+CREATE TABLE migration_checkpoint (
+    stage VARCHAR(30) PRIMARY KEY,
+    last_raw_id INT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- Migration id allocation: next main id per main table. It never goes
+-- backwards, so ids of deleted main rows are not reused while the mapping
+-- tables still reference them
+CREATE TABLE id_sequence (
+    table_name VARCHAR(64) PRIMARY KEY,
+    next_id INT NOT NULL
+);
+
+-- Customer dedup: duplicates of one person map to a single main customer
+ALTER TABLE customer_mapping DROP INDEX main_customer_id;
+CREATE INDEX idx_customer_mapping_main ON customer_mapping (main_customer_id);
+
+-- Products whose name is already in products map to that product, so
+-- several raw products can share one main product
+ALTER TABLE product_mapping DROP INDEX main_product_id;
+CREATE INDEX idx_product_mapping_main ON product_mapping (main_product_id);
+
+CREATE TABLE customer_duplicates (
+    raw_customer_id INT PRIMARY KEY,
+    canonical_raw_id INT NULL,
+    main_customer_id INT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Archive tier: migrated raw rows moved out of the hot *_raw tables
+-- (same columns plus archived_at; natural-key uniqueness is not enforced)
+CREATE TABLE customers_raw_archive LIKE customers_raw;
+ALTER TABLE customers_raw_archive DROP INDEX unique_phone,
+    ADD COLUMN archived_at DATETIME DEFAULT NOW(), ROW_FORMAT=COMPRESSED;
+
+CREATE TABLE products_raw_archive LIKE products_raw;
+ALTER TABLE products_raw_archive DROP INDEX unique_product_name,
+    ADD COLUMN archived_at DATETIME DEFAULT NOW(), ROW_FORMAT=COMPRESSED;
+
+CREATE TABLE orders_raw_archive LIKE orders_raw;
+ALTER TABLE orders_raw_archive
+    ADD COLUMN archived_at DATETIME DEFAULT NOW(), ROW_FORMAT=COMPRESSED;
+
+CREATE TABLE sales_raw_archive LIKE sales_raw;
+ALTER TABLE sales_raw_archive DROP INDEX order_id,
+    ADD COLUMN archived_at DATETIME DEFAULT NOW(), ROW_FORMAT=COMPRESSED;
+
+-- Query cache invalidation across processes: bumped by every write
+-- (utils/query_cache.py bump_tables), read by every cache lookup
+CREATE TABLE table_versions (
+    table_name VARCHAR(64) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
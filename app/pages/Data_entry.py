@@ -15,6 +15,8 @@ from utils.database_insert_operations import (
     insert_raw_sale
     
 )
+from utils.natural_key_index import find_duplicate
+from utils.bulk_import import IMPORT_SPECS, IMPORT_FILE_TYPES, read_import_file, bulk_import
 from utils.database_retrieve_operations import (
     retrieve_table,
     retrieve_all_customers,
@@ -28,6 +30,45 @@ st.title("📊 Data Entry Portal")
 st.write("Add or view entries in your raw database tables below.")
 
 
+# ---------- BULK IMPORT ----------
+st.subheader("📥 Bulk Import")
+with st.expander("Import a CSV or Excel file into a raw table"):
+    import_table = st.selectbox("Target table", list(IMPORT_SPECS))
+    spec = IMPORT_SPECS[import_table]
+    st.caption("Columns: " + ", ".join(
+        f"{c}{' *' if required else ''}" for c, (_, required, _) in spec.items()
+    ) + "  (* required)")
+    upload = st.file_uploader("File", type=list(IMPORT_FILE_TYPES))
+
+    if upload is not None and st.button("Import"):
+        progress = st.progress(0.0, text="Validating...")
+
+        def show_progress(loaded, total):
+            progress.progress(loaded / total if total else 1.0, text=f"Loaded {loaded:,} of {total:,} rows...")
+
+        try:
+            import_df = read_import_file(upload, upload.name)
+            result = bulk_import(import_table, import_df, on_batch=show_progress)
+        except Exception as e:
+            # Unreadable file, missing required columns, or optional
+            # Excel reader not installed
+            result = None
+            st.error(f"Could not import the file: {e}")
+        progress.empty()
+
+        if result and result["status"] == "error":
+            st.error(f"Import stopped after {result['inserted']:,} rows: {result['message']}")
+        elif result:
+            st.success(f"✅ Imported {result['inserted']:,} rows into {import_table} "
+                       f"in {result['seconds']}s ({result['rows_per_sec']:,} rows/sec).")
+        if result and result["rejected"]:
+            st.warning(f"{result['rejected']:,} of {len(import_df):,} rows were rejected.")
+            st.dataframe(result["rejected_rows"], use_container_width=True)
+            st.download_button("⬇️ Download rejected rows",
+                               result["rejected_rows"].to_csv(index=False),
+                               file_name=f"{import_table}_rejected.csv", mime="text/csv")
+
+
 # ---------- CUSTOMER FORM ----------
 st.subheader("👤 Add Customer")
 with st.form("add_customer_form"):
@@ -42,6 +83,8 @@ with st.form("add_customer_form"):
             st.error("Customer Name is required!")
         elif not phone.strip():
             st.error("Customer Phone is required!")
+        elif find_duplicate("customers", phone):
+            st.error("Customer with this phone already exists!")
         else:
             try:
                 success = insert_raw_customer(customer_name, email, phone, city)
@@ -78,6 +121,8 @@ with st.form("add_product_form"):
             st.error("Selling Price must be greater than zero!")
         elif cost_price < 0:
             st.error("Cost Price cannot be negative!")
+        elif find_duplicate("products", product_name):
+            st.error("Product with this name already exists!")
         else:
             try:
                 success = insert_raw_product(product_name, category, selling_price, cost_price, stock)
@@ -146,9 +191,9 @@ else:
 # ---------- SALE FORM (Auto-calculated) ----------
 st.subheader("💰 Add Sale")
 
-orders = retrieve_all_orders()
-customers = retrieve_all_customers()
-products = retrieve_all_products()
+orders = retrieve_all_orders() or []
+customers = retrieve_all_customers() or []
+products = retrieve_all_products() or []
 
 if not orders:
     st.warning("⚠️ Please add at least one order first.")
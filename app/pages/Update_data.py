@@ -9,7 +9,9 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..
 if PROJECT_ROOT not in sys.path:
     sys.path.append(PROJECT_ROOT)
 
-from utils.database_connection import create_connection
+from utils.database_connection import get_connection
+from utils.query_cache import cached_call, cached_read
+from utils.columnar_fetch import read_frame
 from utils.update_data_operations import (
     update_customer_raw, update_customer_main,
     update_product_raw, update_product_main,
@@ -25,25 +27,16 @@ st.write("Choose Raw/Main → Table → Record. Edit allowed fields and click Up
 # Helpers
 # -----------------------
 def fetchall_df(query, params=()):
-    conn = create_connection()
-    cursor = conn.cursor(dictionary=True)
-    try:
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        return pd.DataFrame(rows) if rows else pd.DataFrame()
-    finally:
-        cursor.close()
-        conn.close()
+    return read_frame(query, params)
 
 def fetch_one(query, params=()):
-    conn = create_connection()
-    cursor = conn.cursor(dictionary=True)
-    try:
-        cursor.execute(query, params)
-        return cursor.fetchone()
-    finally:
-        cursor.close()
-        conn.close()
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(query, params)
+            return cursor.fetchone()
+        finally:
+            cursor.close()
 
 def to_native(v):
     """Convert pandas/numpy types to plain Python types for display & DB calls."""
@@ -86,13 +79,15 @@ with col2:
 
 meta = TABLE_META[table_choice]
 
-# fetch listing rows for dropdown
-list_df = fetchall_df(meta["list_q"])
+# fetch listing rows for dropdown (cached until the table is written)
+list_df = cached_call([table_choice], fetchall_df, meta["list_q"])
 if list_df.empty:
     st.info("No records available for this table.")
     st.stop()
 
-# Build quick maps to make labels (no per-row DB calls)
+# Build quick maps to make labels (no per-row DB calls); cached until
+# the customer / order tables are written
+@cached_read("customers_raw", "customers")
 def build_customer_map(raw_or_main):
     tbl = "customers_raw" if raw_or_main == "Raw" else "customers"
     df = fetchall_df(f"SELECT customer_id, customer_name FROM {tbl}")
@@ -104,6 +99,7 @@ def build_customer_map(raw_or_main):
 customer_map_raw = build_customer_map("Raw")
 customer_map_main = build_customer_map("Main")
 
+@cached_read("orders_raw", "orders")
 def build_order_to_customer_map(raw_or_main):
     tbl = "orders_raw" if raw_or_main == "Raw" else "orders"
     df = fetchall_df(f"SELECT order_id, customer_id FROM {tbl}")
@@ -5,8 +5,19 @@ import streamlit as st
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 sys.path.append(PROJECT_ROOT)
 from utils.database_retrieve_operations import (
-    retrieve_table,
+    retrieve_page,
+    get_table_schema,
+    estimate_row_count,
 )
+from utils.data_export import (
+    EXPORT_DOWNLOAD_MAX_MB,
+    EXPORT_FORMATS,
+    EXPORT_TABLES,
+    export_table,
+    export_path,
+    prune_exports,
+)
+from datetime import datetime, time, timedelta
 
 st.set_page_config(page_title="View Data", layout="wide")
 st.title("📊 View Data")
@@ -23,9 +34,112 @@ if category == "Main Tables":
 else:
     selected_table = st.selectbox("Select Table", raw_tables)
 
-if st.button("View Table"):
-    data = retrieve_table(selected_table)
-    if data:
-        st.dataframe(data, use_container_width=True)
+try:
+    all_columns, key_column = get_table_schema(selected_table)
+except Exception as e:
+    st.error(f"Could not fetch data: {e}")
+    st.stop()
+
+# ---------- QUERY OPTIONS (applied in the database) ----------
+with st.expander("Columns, filter and sort"):
+    columns = st.multiselect("Columns", all_columns, default=all_columns)
+    filter_col1, filter_col2 = st.columns(2)
+    filter_column = filter_col1.selectbox("Filter column", ["(none)"] + all_columns)
+    filter_text = filter_col2.text_input("Contains")
+    sort_col1, sort_col2 = st.columns(2)
+    sort_by = sort_col1.selectbox("Sort by", all_columns, index=all_columns.index(key_column) if key_column else 0)
+    descending = sort_col2.checkbox("Descending")
+page_size = st.selectbox("Rows per page", [50, 100, 250, 500], index=1)
+
+filters = {}
+if filter_column != "(none)" and filter_text.strip():
+    filters[filter_column] = ("LIKE", f"%{filter_text.strip()}%")
+
+# ---------- PAGINATION STATE ----------
+# cursors[i] is the keyset cursor page i starts after (None for page 0);
+# any change of table or query options starts again from the first page
+query_key = (selected_table, tuple(columns), tuple(filters.items()), sort_by, descending, page_size)
+if st.session_state.get("view_query") != query_key:
+    st.session_state.view_query = query_key
+    st.session_state.view_cursors = [None]
+
+cursors = st.session_state.view_cursors
+page_number = len(cursors) - 1
+
+try:
+    page = retrieve_page(selected_table, columns or all_columns, filters, sort_by, descending,
+                         page_size, after=cursors[-1])
+except Exception as e:
+    st.error(f"Could not fetch data: {e}")
+    st.stop()
+
+total = estimate_row_count(selected_table)
+st.caption(f"Page {page_number + 1} · ~{total:,} rows in {selected_table} (estimate)")
+
+if page["rows"]:
+    st.dataframe(page["rows"], use_container_width=True)
+else:
+    st.info("No rows match.")
+
+prev_col, next_col = st.columns(2)
+if prev_col.button("⬅️ Previous", disabled=page_number == 0):
+    cursors.pop()
+    st.rerun()
+if next_col.button("Next ➡️", disabled=not page["has_more"]):
+    cursors.append(page["next_cursor"])
+    st.rerun()
+
+# ---------- EXPORT ----------
+# Streamed from the database chunk by chunk to a file on the server, so
+# neither the page nor the browser grid ever holds the whole table
+st.subheader("Export")
+date_column = EXPORT_TABLES[selected_table][1]
+export_col1, export_col2 = st.columns(2)
+export_format = export_col1.radio("Format", EXPORT_FORMATS, horizontal=True,
+                                  format_func=lambda f: f.upper())
+use_dates = export_col2.checkbox(f"Filter by {date_column}")
+date_from = date_to = None
+if use_dates:
+    date_col1, date_col2 = st.columns(2)
+    start = date_col1.date_input("From (inclusive)")
+    end = date_col2.date_input("To (inclusive)")
+    date_from = datetime.combine(start, time.min)
+    date_to = datetime.combine(end + timedelta(days=1), time.min)
+st.caption(
+    f"Exports the columns selected above ({len(columns or all_columns)}). "
+    f"The file is offered for download once complete, up to {EXPORT_DOWNLOAD_MAX_MB} MB; "
+    f"use `python -m utils.data_export` for larger exports."
+)
+
+if st.button("Prepare export"):
+    # Each session keeps only its latest file; abandoned ones expire
+    previous = st.session_state.pop("view_export", None)
+    if previous and os.path.exists(previous["path"]):
+        os.remove(previous["path"])
+    prune_exports()
+    progress = st.empty()
+    progress.caption("Exporting...")
+
+    def show_progress(rows):
+        # The table estimate says nothing about a date range, so a
+        # filtered export only shows the rows written so far
+        if use_dates or not total:
+            progress.caption(f"Exported {rows:,} rows...")
+        else:
+            progress.progress(min(rows / total, 1.0), text=f"Exported {rows:,} rows...")
+
+    result = export_table(selected_table, export_path(selected_table, export_format), export_format,
+                          columns or all_columns, date_from, date_to, on_chunk=show_progress,
+                          max_bytes=EXPORT_DOWNLOAD_MAX_MB * 1024 * 1024)
+    progress.empty()
+    if result["status"] == "error":
+        st.error(f"Export failed: {result['message']}")
     else:
-        st.error("Could not fetch data.")
+        st.session_state.view_export = result
+
+export = st.session_state.get("view_export")
+if export and os.path.exists(export["path"]):
+    st.success(f"{export['rows']:,} rows, {export['bytes'] / 1024 / 1024:.1f} MB")
+    with open(export["path"], "rb") as f:
+        st.download_button("⬇️ Download", f, file_name=os.path.basename(export["path"]),
+                           mime="text/csv" if export["path"].endswith(".csv") else "application/octet-stream")
@@ -0,0 +1,125 @@
+from dotenv import load_dotenv
+import os
+
+# Loading environment variables
+load_dotenv()
+
+# Default number of rows sent per statement by the batched writers
+BATCH_SIZE = int(os.getenv("DB_BATCH_SIZE", 1000))
+
+# Default number of rows held in memory per chunk by the streaming readers
+CHUNK_SIZE = int(os.getenv("DB_CHUNK_SIZE", 10000))
+
+
+def chunked(items, size):
+    """Splits a list into consecutive slices of at most size items."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def batch_insert(cursor, table_name, columns, rows, batch_size=BATCH_SIZE):
+    """
+    Inserts many rows with one multi-row INSERT per batch.
+
+    mysql-connector rewrites executemany() of a plain INSERT ... VALUES
+    into a single multi-row statement, so each batch is one round trip.
+
+    Args:
+        cursor: Open cursor on the connection to write through.
+        table_name (str): Table to insert into.
+        columns (list of str): Columns being inserted.
+        rows (list of tuple): One tuple of values per row.
+        batch_size (int): Maximum rows per statement.
+
+    Returns:
+        int: Number of rows inserted.
+    """
+    query = (
+        f"INSERT INTO {table_name} ({', '.join(columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))})"
+    )
+    inserted = 0
+    for batch in chunked(rows, batch_size):
+        cursor.executemany(query, batch)
+        inserted += cursor.rowcount
+    return inserted
+
+
+def fetch_in_chunks(cursor, table_name, key_column, columns, where="TRUE", chunk_size=CHUNK_SIZE):
+    """
+    Streams rows of a table in primary-key order, one chunk at a time.
+
+    Uses keyset pagination (key > last key seen) so each chunk is an index
+    range scan and at most chunk_size rows are held in memory. The cursor
+    is free between chunks, so callers may write through it while
+    iterating.
+
+    Args:
+        cursor: Open dictionary cursor.
+        table_name (str): Table to read.
+        key_column (str): Integer primary key column.
+        columns (list of str): Columns to select besides the key.
+        where (str): Extra SQL predicate restricting the rows.
+        chunk_size (int): Maximum rows per chunk.
+
+    Yields:
+        list of dict: The next chunk of rows.
+    """
+    select_cols = ", ".join([key_column] + [c for c in columns if c != key_column])
+    query = (
+        f"SELECT {select_cols} FROM {table_name} "
+        f"WHERE ({where}) AND {key_column} > %s "
+        f"ORDER BY {key_column} LIMIT %s"
+    )
+    last_key = -1
+    while True:
+        cursor.execute(query, (last_key, chunk_size))
+        rows = cursor.fetchall()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        last_key = rows[-1][key_column]
+
+
+def batch_update(cursor, table_name, key_column, columns, rows, batch_size=BATCH_SIZE):
+    """
+    Updates many rows of a table with one statement per batch.
+
+    Each batch is sent as a derived table of literal rows joined to the
+    target table on its key column, so N changed rows cost
+    ceil(N / batch_size) round trips instead of N.
+
+    Args:
+        cursor: Open cursor on the connection to write through.
+        table_name (str): Table to update.
+        key_column (str): Primary key column used to match rows.
+        columns (list of str): Columns to overwrite.
+        rows (list of tuple): (key, value_1, ..., value_n) per row, in the
+            same order as columns.
+        batch_size (int): Maximum rows per statement.
+
+    Returns:
+        int: Number of rows the server reported as changed.
+    """
+    if not rows:
+        return 0
+
+    all_columns = [key_column] + list(columns)
+    first_select = "SELECT " + ", ".join(f"%s AS `{c}`" for c in all_columns)
+    next_select = "SELECT " + ", ".join(["%s"] * len(all_columns))
+    set_clause = ", ".join(f"t.`{c}` = v.`{c}`" for c in columns)
+
+    changed = 0
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        derived = " UNION ALL ".join([first_select] + [next_select] * (len(batch) - 1))
+        query = (
+            f"UPDATE {table_name} t "
+            f"JOIN ({derived}) v ON t.`{key_column}` = v.`{key_column}` "
+            f"SET {set_clause}"
+        )
+        cursor.execute(query, [value for row in batch for value in row])
+        changed += cursor.rowcount
+    return changed
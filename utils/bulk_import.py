@@ -0,0 +1,406 @@
+"""
+Bulk import of CSV / Excel files into the raw tables.
+
+A file is validated as a whole with column operations (types, required
+fields, lengths, allowed values, references and duplicate natural keys),
+then the accepted rows are loaded in batches on one connection: a
+multi-row INSERT per batch, or LOAD DATA LOCAL INFILE when the server
+and DB_LOCAL_INFILE allow it. Rejected rows are reported with a reason.
+
+Example:
+    python -m utils.bulk_import customers_raw supplier_customers.csv
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import pandas as pd
+from dotenv import load_dotenv
+from mysql.connector import Error
+from utils.database_connection import get_connection, LOCAL_INFILE
+from utils.batch_operations import BATCH_SIZE, batch_insert, chunked
+from utils.customer_dedup import normalize_phones
+from utils.natural_key_index import get_index, invalidate_index, normalize_key
+from utils.query_cache import bump_tables
+from utils.type_conversion import to_python
+
+# Loading environment variables
+load_dotenv()
+
+# Rows loaded per transaction by bulk_import()
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 5000))
+
+ORDER_STATUSES = ["Pending", "Processing", "Shipped", "Delivered", "Cancelled", "Returned"]
+PAYMENT_METHODS = ["Credit Card", "Debit Card", "UPI", "Cash on Delivery", "Net Banking", "Wallet"]
+
+# raw table -> column -> (kind, required, limit)
+#   kind "text": limit is the maximum length
+#   kind "int" / "decimal": limit is the smallest allowed value (or None)
+#   kind "choice": limit is the list of allowed values
+#   kind "datetime": no limit; missing dates get the import time (DEFAULT NOW())
+IMPORT_SPECS = {
+    "customers_raw": {
+        "customer_name": ("text", True, 50),
+        "email": ("text", False, 50),
+        "phone": ("text", True, 10),
+        "city": ("text", False, 30),
+        "created_at": ("datetime", False, None),
+    },
+    "products_raw": {
+        "product_name": ("text", True, 50),
+        "category": ("text", True, 50),
+        "selling_price": ("decimal", True, 0.01),
+        "cost_price": ("decimal", True, 0),
+        "stock": ("int", False, 0),
+        "added_at": ("datetime", False, None),
+    },
+    "orders_raw": {
+        "customer_id": ("int", True, 1),
+        "product_id": ("int", True, 1),
+        "quantity": ("int", True, 1),
+        "order_status": ("choice", False, ORDER_STATUSES),
+        "payment_method": ("choice", True, PAYMENT_METHODS),
+        "order_date": ("datetime", False, None),
+    },
+    "sales_raw": {
+        "order_id": ("int", True, 1),
+        "sale_amount": ("decimal", True, 0),
+        "profit": ("decimal", False, None),
+        "region": ("text", False, 20),
+        "sale_date": ("datetime", False, None),
+    },
+}
+
+# raw table -> column -> function applied to the present values before
+# they are checked, so "+91 98765-43210" is stored (and matched) as the
+# 10 digits the phone column holds
+NORMALIZERS = {
+    "customers_raw": {"phone": normalize_phones},
+}
+
+# raw table -> natural key checked against the file and the database
+NATURAL_KEYS = {
+    "customers_raw": ("phone", "customers"),
+    "products_raw": ("product_name", "products"),
+}
+
+# raw table -> column -> tables whose ids it must reference (raw or main)
+REFERENCES = {
+    "orders_raw": {"customer_id": ("customers_raw", "customers"),
+                   "product_id": ("products_raw", "products")},
+    "sales_raw": {"order_id": ("orders_raw", "orders")},
+}
+
+IMPORT_METHODS = ("insert", "load_data")
+
+# Accepted file types; .xlsx/.xlsm are read with openpyxl, .xls with xlrd
+# (both optional)
+EXCEL_TYPES = ("xlsx", "xlsm", "xls")
+IMPORT_FILE_TYPES = ("csv",) + EXCEL_TYPES
+
+
+# =====================================================
+# READING
+# =====================================================
+def read_import_file(source, file_name=None):
+    """
+    Reads a CSV or Excel file into a DataFrame of strings.
+
+    Every cell is read as text so validation sees exactly what the file
+    holds. Column names are stripped and lower-cased. Excel files need
+    the optional openpyxl (.xlsx, .xlsm) or xlrd (.xls) package.
+
+    Args:
+        source: Path or file-like object (e.g. a Streamlit upload).
+        file_name (str, optional): Name used to detect the format when
+            source is not a path.
+    """
+    name = (file_name or str(source)).lower()
+    if name.endswith(tuple(f".{ext}" for ext in EXCEL_TYPES)):
+        df = pd.read_excel(source, dtype=str)
+    else:
+        df = pd.read_csv(source, dtype=str, skipinitialspace=True)
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    return df
+
+
+# =====================================================
+# VALIDATION
+# =====================================================
+def _reject(reasons, mask, reason):
+    # Keeps the first reason found for each row
+    reasons[mask.fillna(False).astype(bool) & reasons.isna()] = reason
+
+
+def _known_ids(tables, ids):
+    # Only the distinct ids the file references, looked up in batches
+    key_column = {"customers": "customer_id", "products": "product_id", "orders": "order_id"}
+    ids = [int(i) for i in ids]
+    found = set()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            for table in tables:
+                column = key_column[table.removesuffix("_raw")]
+                for batch in chunked([i for i in ids if i not in found], BATCH_SIZE):
+                    cursor.execute(
+                        f"SELECT {column} FROM {table} WHERE {column} IN ({', '.join(['%s'] * len(batch))})",
+                        batch
+                    )
+                    found.update(row[0] for row in cursor.fetchall())
+        finally:
+            cursor.close()
+    return found
+
+
+def validate_rows(table_name, df):
+    """
+    Checks every row of an import file against the raw table's spec.
+
+    Works column by column: each check is one vectorized operation over
+    the whole file. Rows are rejected for a missing required value, a
+    value that does not parse, is too long, below its minimum or not in
+    the allowed list, an ambiguous date, an unknown referenced id, or a
+    natural key (phone, product name) already in the file or in the
+    database. Phones are reduced to their 10 digits (NORMALIZERS) before
+    they are checked. Dates are ISO (YYYY-MM-DD) or day first (DD/MM/YYYY).
+
+    Args:
+        table_name (str): One of IMPORT_SPECS.
+        df (pd.DataFrame): File contents as read by read_import_file().
+
+    Returns:
+        tuple: (accepted, rejected) DataFrames. accepted holds the typed
+            values of the spec's columns; rejected holds the original
+            cells plus "line" (line number in the file) and "reason".
+
+    Raises:
+        ValueError: For an unknown table or a file missing a required column.
+    """
+    if table_name not in IMPORT_SPECS:
+        raise ValueError(f"Cannot import into '{table_name}', expected one of {list(IMPORT_SPECS)}")
+    spec = IMPORT_SPECS[table_name]
+    missing = [c for c, (_, required, _) in spec.items() if required and c not in df.columns]
+    if missing:
+        raise ValueError(f"File is missing required column(s): {', '.join(missing)}")
+
+    reasons = pd.Series(pd.NA, index=df.index, dtype="object")
+    typed = {}
+    for column, (kind, required, limit) in spec.items():
+        if column not in df.columns:
+            continue
+        raw = df[column].astype("str").str.strip().where(df[column].notna())
+        raw = raw.mask(raw == "")
+        present = raw.notna()
+        if required:
+            _reject(reasons, ~present, f"missing {column}")
+        normalize = NORMALIZERS.get(table_name, {}).get(column)
+        if normalize is not None:
+            raw = pd.Series(normalize(raw).to_numpy(), index=raw.index).where(present)
+            _reject(reasons, present & (raw == ""), f"invalid {column}")
+
+        if kind == "int":
+            _reject(reasons, present & ~raw.str.fullmatch(r"[+-]?\d+(\.0*)?").fillna(False), f"invalid {column}")
+        if kind == "text":
+            _reject(reasons, raw.str.len() > limit, f"{column} longer than {limit}")
+            value = raw
+        elif kind in ("int", "decimal"):
+            value = pd.to_numeric(raw, errors="coerce")
+            value = value.mask(value.abs() == float("inf"))
+            _reject(reasons, present & value.isna(), f"invalid {column}")
+            if limit is not None:
+                _reject(reasons, value < limit, f"{column} below {limit}")
+            value = value.round(0).astype("Int64") if kind == "int" else value.round(2)
+        elif kind == "choice":
+            lookup = {c.casefold(): c for c in limit}
+            value = raw.str.casefold().map(lookup)
+            _reject(reasons, present & value.isna(), f"invalid {column}")
+            # Same as the column default (the first allowed value)
+            value = value.where(present, limit[0])
+        else:
+            # ISO dates as written; anything else is read day first
+            # (DD/MM/YYYY, as in the supplier feeds)
+            iso = raw.str.match(r"\d{4}-\d{1,2}-\d{1,2}").fillna(False).astype(bool)
+            value = pd.to_datetime(raw.where(iso), errors="coerce", format="ISO8601")
+            other = present & ~iso
+            if other.any():
+                value = value.fillna(pd.to_datetime(raw.where(other), errors="coerce",
+                                                    format="mixed", dayfirst=True))
+            _reject(reasons, present & value.isna(), f"invalid {column}")
+            # 01/02/2024 could be either order; accept it only if the
+            # file elsewhere has a day above 12 in first position
+            parts = raw.where(other & value.notna()).str.extract(r"^(\d{1,2})[/.-](\d{1,2})[/.-]")
+            first, second = pd.to_numeric(parts[0]), pd.to_numeric(parts[1])
+            if not (first > 12).any():
+                _reject(reasons, (first <= 12) & (second <= 12) & (first != second),
+                        f"ambiguous {column}, use YYYY-MM-DD")
+            # Same as the column default, DEFAULT NOW()
+            value = value.fillna(pd.Timestamp.now().floor("s"))
+        typed[column] = value
+
+    for column, tables in REFERENCES.get(table_name, {}).items():
+        known = _known_ids(tables, typed[column].dropna().unique())
+        _reject(reasons, typed[column].notna() & ~typed[column].isin(known), f"unknown {column}")
+
+    if table_name in NATURAL_KEYS:
+        column, main_table = NATURAL_KEYS[table_name]
+        # Same comparison form as the natural-key indexes, so accent and
+        # case variants count as repeats like they do in the database
+        keys = typed[column].map(normalize_key, na_action="ignore")
+        _reject(reasons, keys.notna() & keys.duplicated(), f"{column} repeated in file")
+        existing = set()
+        for table in (table_name, main_table):
+            index = get_index(table)
+            index.refresh()
+            existing.update(v for v in keys.dropna().unique() if index.get(v, refresh=False) is not None)
+        _reject(reasons, keys.isin(existing), f"{column} already exists")
+
+    ok = reasons.isna()
+    accepted = pd.DataFrame({c: v[ok] for c, v in typed.items()})
+    rejected = df[~ok].copy()
+    # Header is line 1
+    rejected.insert(0, "line", rejected.index + 2)
+    rejected["reason"] = reasons[~ok]
+    return accepted, rejected.reset_index(drop=True)
+
+
+# =====================================================
+# LOADING
+# =====================================================
+def _load_data_batch(cursor, table_name, batch):
+    # Local file in MySQL's default text format: tab separated, backslash
+    # escapes, \N for NULL
+    fields = []
+    for column in batch.columns:
+        values = batch[column]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            text = values.dt.strftime("%Y-%m-%d %H:%M:%S")
+        elif pd.api.types.is_numeric_dtype(values):
+            text = values.astype("string")
+        else:
+            text = (values.astype("string").str.replace("\\", "\\\\", regex=False)
+                    .str.replace("\t", "\\t", regex=False).str.replace("\n", "\\n", regex=False))
+        fields.append(text.fillna("\\N"))
+    lines = fields[0].str.cat(fields[1:], sep="\t") if len(fields) > 1 else fields[0]
+
+    with tempfile.NamedTemporaryFile("w", suffix=".tsv", delete=False, encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+        path = f.name
+    try:
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE {table_name} "
+            f"CHARACTER SET utf8mb4 ({', '.join(batch.columns)})",
+            (path,)
+        )
+        return cursor.rowcount
+    finally:
+        os.remove(path)
+
+
+def bulk_import(table_name, df, batch_size=IMPORT_BATCH_SIZE, method=None, on_batch=None):
+    """
+    Validates an import file and loads its accepted rows into a raw table.
+
+    Accepted rows are loaded batch_size rows per transaction on one
+    pooled connection, as multi-row INSERTs (method "insert") or with
+    LOAD DATA LOCAL INFILE (method "load_data", needs DB_LOCAL_INFILE=1
+    and local_infile enabled on the server). The default is "load_data"
+    when DB_LOCAL_INFILE is set, else "insert". Batches committed before
+    an error stay loaded.
+
+    Args:
+        table_name (str): One of IMPORT_SPECS.
+        df (pd.DataFrame): File contents as read by read_import_file().
+        batch_size (int): Rows per transaction.
+        method (str, optional): One of IMPORT_METHODS.
+        on_batch (callable, optional): Called as on_batch(loaded, total)
+            after each batch.
+
+    Returns:
+        dict: {"status", "accepted", "rejected", "inserted", "batches",
+               "seconds", "rows_per_sec", "rejected_rows" (DataFrame)},
+               plus "message" on errors.
+
+    Raises:
+        ValueError: For an unknown table or method, or a file missing a
+            required column.
+    """
+    method = method or ("load_data" if LOCAL_INFILE else "insert")
+    if method not in IMPORT_METHODS:
+        raise ValueError(f"Unknown import method '{method}', expected one of {IMPORT_METHODS}")
+    start = time.perf_counter()
+    accepted, rejected = validate_rows(table_name, df)
+    columns = list(accepted.columns)
+    inserted = 0
+    batches = 0
+
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                for first in range(0, len(accepted), batch_size):
+                    batch = accepted.iloc[first:first + batch_size]
+                    if method == "load_data":
+                        inserted += _load_data_batch(cursor, table_name, batch)
+                    else:
+                        rows = [tuple(v.to_pydatetime() if isinstance(v, pd.Timestamp) else to_python(v)
+                                      for v in row)
+                                for row in batch.itertuples(index=False)]
+                        inserted += batch_insert(cursor, table_name, columns, rows, BATCH_SIZE)
+                    conn.commit()
+                    batches += 1
+                    if on_batch:
+                        on_batch(inserted, len(accepted))
+            finally:
+                cursor.close()
+        status = {"status": "success"}
+
+    except (Error, ConnectionError, OSError) as e:
+        status = {"status": "error", "message": str(e)}
+
+    finally:
+        if inserted:
+            bump_tables(table_name)
+            if table_name in NATURAL_KEYS:
+                invalidate_index(table_name)
+
+    seconds = time.perf_counter() - start
+    return {
+        **status,
+        "accepted": len(accepted),
+        "rejected": len(rejected),
+        "inserted": inserted,
+        "batches": batches,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(inserted / seconds, 1) if seconds > 0 else 0.0,
+        "rejected_rows": rejected,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import a CSV/Excel file into a raw table.")
+    parser.add_argument("table", choices=list(IMPORT_SPECS))
+    parser.add_argument("path", help="CSV or Excel file")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help="Rows per transaction")
+    parser.add_argument("--method", choices=IMPORT_METHODS, help="Load method (default from DB_LOCAL_INFILE)")
+    parser.add_argument("--rejects", help="Write rejected rows with their reason to this CSV file")
+    args = parser.parse_args(argv)
+
+    df = read_import_file(args.path)
+    result = bulk_import(args.table, df, args.batch_size, args.method,
+                         on_batch=lambda done, total: print(f"  {done}/{total} rows loaded"))
+    print(f"{result['accepted']} accepted, {result['rejected']} rejected, "
+          f"{result['inserted']} inserted in {result['batches']} batch(es), "
+          f"{result['seconds']}s ({result['rows_per_sec']} rows/sec)")
+    if args.rejects and result["rejected"]:
+        result["rejected_rows"].to_csv(args.rejects, index=False)
+        print(f"Rejected rows written to {args.rejects}")
+    if result["status"] == "error":
+        print(f"Stopped by error: {result['message']}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+import re
+import numpy as np
+import pandas as pd
+from decimal import Decimal
+from utils.batch_operations import BATCH_SIZE, CHUNK_SIZE, batch_update
+from utils.columnar_fetch import fetch_frames_in_chunks
+from utils.price_normalization import normalize_prices
+from utils.type_conversion import to_python
+
+
+# =====================================================
+# RULE DEFINITIONS
+# =====================================================
+# A rule set maps a column to the ordered list of rules applied to it, e.g.
+#
+#     {"email": ["trim", ("default_if_empty", "Unknown"), "lower"]}
+#
+# A rule is a name, or a (name, argument) tuple. Every rule has a SQL form,
+# a pandas form, or both. A rule set whose rules all have a SQL form is
+# compiled into one UPDATE; otherwise it runs as one vectorized pandas pass
+# per chunk followed by one batched write of the rows that changed. Either
+# way the table is scanned once no matter how many rules are declared.
+
+def _blank(s):
+    # "string" keeps NULL as <NA> (astype("str") turns it into "None"
+    # on pandas 2)
+    return s.isna() | (s.astype("string").str.strip() == "").fillna(False)
+
+
+def _parse_price(s):
+    # Unparsable values keep their stored value and are reported as failed
+    prices, failed = normalize_prices(s)
+    return prices.where(~failed, s), failed
+
+
+# rule name -> (SQL template, pandas function)
+# SQL templates use {col} for the column expression and {arg} for an
+# argument that is inlined as SQL; %s marks an argument passed as a
+# parameter. pandas functions take the Series (and the argument, if any)
+# and return the new Series, or (Series, failed_mask) for parsing rules.
+RULES = {
+    "trim": (
+        "TRIM({col})",
+        lambda s: s.str.strip(),
+    ),
+    "collapse_spaces": (
+        "REGEXP_REPLACE({col}, '\\\\s+', ' ')",
+        lambda s: s.str.replace(r"\s+", " ", regex=True),
+    ),
+    "lower": (
+        "LOWER({col})",
+        lambda s: s.str.lower(),
+    ),
+    "title": (
+        None,
+        lambda s: s.str.title(),
+    ),
+    "capitalize": (
+        "CONCAT(UPPER(LEFT({col}, 1)), LOWER(SUBSTRING({col}, 2)))",
+        lambda s: s.str.capitalize(),
+    ),
+    "default_if_empty": (
+        "CASE WHEN {col} IS NULL OR TRIM({col}) = '' THEN %s ELSE {col} END",
+        lambda s, default: s.where(~_blank(s), default),
+    ),
+    "clamp_non_negative": (
+        "CASE WHEN {col} < 0 THEN 0 ELSE {col} END",
+        lambda s: s.clip(lower=0),
+    ),
+    "parse_price": (
+        None,
+        _parse_price,
+    ),
+    # SQL only: fill '' from another expression of the same UPDATE (joins)
+    "fill_empty_from": (
+        "CASE WHEN {col} = '' THEN {arg} ELSE {col} END",
+        None,
+    ),
+}
+
+# Rules that operate on text and need a string-typed Series
+_TEXT_RULES = {"trim", "collapse_spaces", "lower", "title", "capitalize"}
+
+
+def _split_rule(rule):
+    if isinstance(rule, tuple):
+        name, arg = rule
+    else:
+        name, arg = rule, None
+    if name not in RULES:
+        raise ValueError(f"Unknown cleaning rule '{name}'")
+    return name, arg
+
+
+# =====================================================
+# SQL BACKEND
+# =====================================================
+def compile_rules_sql(rules, alias="t"):
+    """
+    Compiles a rule set into the SET clause of one UPDATE.
+
+    Args:
+        rules (dict): column -> list of rules.
+        alias (str): Alias of the table being updated.
+
+    Returns:
+        tuple: (set_clause, params), or None if any rule has no SQL form.
+    """
+    assignments = []
+    params = []
+    for column, column_rules in rules.items():
+        expr = f"{alias}.`{column}`"
+        expr_params = []
+        for rule in column_rules:
+            name, arg = _split_rule(rule)
+            template = RULES[name][0]
+            if template is None:
+                return None
+            # Rebuild the expression piece by piece so parameters stay in
+            # placeholder order even when {col} appears several times
+            pieces = []
+            new_params = []
+            for token in re.split(r"(\{col\}|%s)", template):
+                if token == "{col}":
+                    pieces.append(expr)
+                    new_params.extend(expr_params)
+                elif token == "%s":
+                    pieces.append("%s")
+                    new_params.append(arg)
+                else:
+                    pieces.append(token.replace("{arg}", str(arg)))
+            expr = "".join(pieces)
+            expr_params = new_params
+        assignments.append(f"{alias}.`{column}` = {expr}")
+        params.extend(expr_params)
+    return ", ".join(assignments), params
+
+
+# =====================================================
+# PANDAS BACKEND
+# =====================================================
+def apply_rules(df, rules, failures=None):
+    """
+    Applies a rule set to a DataFrame in one vectorized pass.
+
+    Args:
+        df (pd.DataFrame): Rows holding every column named in rules.
+        rules (dict): column -> list of rules.
+        failures (dict, optional): Filled with column -> boolean mask of
+            the rows a parsing rule could not handle.
+
+    Returns:
+        pd.DataFrame: The cleaned rule columns, same index as df.
+
+    Raises:
+        ValueError: If a rule has no pandas form.
+    """
+    cleaned = pd.DataFrame(index=df.index)
+    for column, column_rules in rules.items():
+        s = df[column]
+        for rule in column_rules:
+            name, arg = _split_rule(rule)
+            func = RULES[name][1]
+            if func is None:
+                raise ValueError(f"Cleaning rule '{name}' can only run as SQL")
+            if name in _TEXT_RULES:
+                s = s.astype("string")
+            result = func(s) if arg is None else func(s, arg)
+            if isinstance(result, tuple):
+                s, failed = result
+                if failures is not None:
+                    failures[column] = failures.get(column, False) | failed
+            else:
+                s = result
+        cleaned[column] = s
+    return cleaned
+
+
+def _comparable(value):
+    # DECIMAL columns arrive as Decimal and parsed prices as float, and
+    # 10.1 != Decimal("10.10"); numbers are compared as Decimal instead
+    if isinstance(value, (float, int, np.number)) and not isinstance(value, bool):
+        return Decimal(str(value))
+    return value
+
+
+def _changed_mask(before, after):
+    """Rows where any rule column differs, treating NA == NA and equal numbers as equal."""
+    mask = pd.Series(False, index=before.index)
+    for column in after.columns:
+        old, new = before[column], after[column]
+        both_na = old.isna() & new.isna()
+        mask |= (old.astype(object).map(_comparable) != new.astype(object).map(_comparable)) & ~both_na
+    return mask
+
+
+# =====================================================
+# RUNNER
+# =====================================================
+def run_rules(cursor, conn, table_name, key_column, rules, scope="TRUE",
+              joins="", alias="t", batch_size=BATCH_SIZE, chunk_size=CHUNK_SIZE):
+    """
+    Runs a rule set over the rows of a table selected by scope.
+
+    Uses a single UPDATE when every rule compiles to SQL, otherwise
+    streams the rows in chunks through apply_rules() and writes back only
+    the rows that changed, one batched statement per batch.
+
+    Args:
+        cursor: Open dictionary cursor.
+        conn: Connection of the cursor, committed after each chunk.
+        table_name (str): Raw table to clean.
+        key_column (str): Its primary key.
+        rules (dict): column -> list of rules.
+        scope (str): Row filter with an {a} alias placeholder.
+        joins (str): JOIN clauses for the SQL backend (fill_empty_from).
+        alias (str): Alias of table_name used by joins.
+
+    Returns:
+        dict: {"changed": rows changed,
+               "failed": column -> keys of rows a parsing rule rejected}
+    """
+    compiled = compile_rules_sql(rules, alias)
+    if compiled is not None:
+        set_clause, params = compiled
+        cursor.execute(
+            f"UPDATE {table_name} {alias} {joins} SET {set_clause} "
+            f"WHERE {scope.format(a=alias + '.')}",
+            params,
+        )
+        conn.commit()
+        return {"changed": cursor.rowcount, "failed": {}}
+
+    columns = list(rules)
+    changed = 0
+    failed_keys = {}
+    for before in fetch_frames_in_chunks(cursor, table_name, key_column, columns,
+                                         scope.format(a=""), chunk_size):
+        failures = {}
+        after = apply_rules(before, rules, failures)
+        for column, failed in failures.items():
+            keys = before.loc[failed, key_column].tolist()
+            if keys:
+                failed_keys.setdefault(column, []).extend(keys)
+        mask = _changed_mask(before, after)
+        if mask.any():
+            changed_rows = [
+                tuple(to_python(v) for v in (key, *values))
+                for key, values in zip(before.loc[mask, key_column],
+                                       after.loc[mask, columns].itertuples(index=False))
+            ]
+            changed += batch_update(cursor, table_name, key_column, columns,
+                                    changed_rows, batch_size)
+        conn.commit()
+    return {"changed": changed, "failed": failed_keys}
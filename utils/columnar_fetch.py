@@ -0,0 +1,123 @@
+import pandas as pd
+from mysql.connector import FieldType
+from utils.database_connection import get_connection
+from utils.batch_operations import CHUNK_SIZE
+
+_INTEGER_TYPES = {FieldType.TINY, FieldType.SHORT, FieldType.INT24, FieldType.LONG,
+                  FieldType.LONGLONG, FieldType.YEAR}
+_FLOAT_TYPES = {FieldType.FLOAT, FieldType.DOUBLE}
+
+
+def _column_dtype(type_code):
+    # Only numbers get an explicit dtype. Everything else is inferred by
+    # pandas: DECIMAL stays object (exact Decimal values), dates become
+    # datetime64, and text is "str" on pandas 3 but object on pandas 2
+    if type_code in _INTEGER_TYPES:
+        return "Int64"
+    if type_code in _FLOAT_TYPES:
+        return "float64"
+    return None
+
+
+def _chunk_to_columns(description, rows):
+    """Transposes one chunk of row tuples into one typed Series per column."""
+    columns = zip(*rows)
+    return [
+        pd.Series(list(values), dtype=_column_dtype(desc[1]), name=desc[0])
+        for desc, values in zip(description, columns)
+    ]
+
+
+def fetch_frame(cursor, query, params=(), chunk_size=CHUNK_SIZE):
+    """
+    Runs a query and decodes the result straight into a DataFrame.
+
+    Rows are read chunk_size at a time as plain tuples (no dict per row)
+    and each chunk is turned into typed column arrays right away, so only
+    one chunk of Python row objects is alive at any time. Integer columns
+    come back as int64 (nullable Int64 if they hold NULLs), FLOAT/DOUBLE
+    as float64.
+
+    Args:
+        cursor: Open cursor; a tuple (non-dictionary) cursor avoids
+            building a dict per row. A dictionary cursor also works.
+        query (str): SELECT statement.
+        params (sequence): Query parameters.
+        chunk_size (int): Rows decoded per step.
+
+    Returns:
+        pd.DataFrame: The result, with the query's column order (empty
+            frame with those columns if there are no rows).
+    """
+    cursor.execute(query, params)
+    description = cursor.description
+    names = [desc[0] for desc in description]
+    chunks = []
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        if isinstance(rows[0], dict):
+            rows = [tuple(row[name] for name in names) for row in rows]
+        chunks.append(_chunk_to_columns(description, rows))
+
+    if not chunks:
+        return pd.DataFrame(columns=names)
+
+    data = {}
+    for i, name in enumerate(names):
+        column = pd.concat([chunk[i] for chunk in chunks], ignore_index=True) if len(chunks) > 1 else chunks[0][i]
+        if column.dtype == "Int64" and not column.hasnans:
+            column = column.astype("int64")
+        data[name] = column
+    return pd.DataFrame(data)
+
+
+def fetch_frames_in_chunks(cursor, table_name, key_column, columns, where="TRUE", chunk_size=CHUNK_SIZE,
+                           params=()):
+    """
+    Columnar counterpart of batch_operations.fetch_in_chunks(): the same
+    keyset scan in primary-key order, yielding each chunk as a DataFrame
+    built by fetch_frame(). params fill %s placeholders in where.
+
+    Yields:
+        pd.DataFrame: The next chunk, key column first.
+    """
+    select_cols = ", ".join([key_column] + [c for c in columns if c != key_column])
+    query = (
+        f"SELECT {select_cols} FROM {table_name} "
+        f"WHERE ({where}) AND {key_column} > %s "
+        f"ORDER BY {key_column} LIMIT %s"
+    )
+    last_key = -1
+    while True:
+        df = fetch_frame(cursor, query, (*params, last_key, chunk_size), chunk_size)
+        if df.empty:
+            return
+        yield df
+        if len(df) < chunk_size:
+            return
+        last_key = int(df[key_column].iat[-1])
+
+
+def read_frame(query, params=(), chunk_size=CHUNK_SIZE):
+    """fetch_frame() on a pooled connection."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            return fetch_frame(cursor, query, params, chunk_size)
+        finally:
+            cursor.close()
+
+
+def read_arrow(query, params=(), chunk_size=CHUNK_SIZE):
+    """
+    Like read_frame() but returns a pyarrow.Table.
+
+    Needs the optional pyarrow package.
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+    import pyarrow as pa
+    return pa.Table.from_pandas(read_frame(query, params, chunk_size), preserve_index=False)
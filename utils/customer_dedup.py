@@ -0,0 +1,296 @@
+import pandas as pd
+from difflib import SequenceMatcher
+from itertools import combinations
+from mysql.connector import Error
+from utils.database_connection import get_connection
+from utils.batch_operations import BATCH_SIZE, batch_insert, batch_update, chunked
+from utils.columnar_fetch import fetch_frame
+from utils.natural_key_index import get_index, invalidate_index
+from utils.query_cache import invalidates
+
+# Minimum name similarity (0..1) for a fuzzy match
+NAME_THRESHOLD = 0.85
+
+# Blocks larger than this are only matched on exact phone / email, so one
+# very common key cannot make the pairwise pass quadratic
+MAX_BLOCK_SIZE = 200
+
+# Email values preprocessing uses for "no email"
+MISSING_EMAILS = {"", "unknown", "none", "nan"}
+
+
+# =====================================================
+# NORMALIZATION
+# =====================================================
+def normalize_phones(phones):
+    """
+    Reduces phone numbers to their national 10 digits.
+
+    Drops spaces, dashes, brackets, a leading '+91' / '91' country code and
+    trunk zeros, so "+91 98765-43210", "098765 43210" and "9876543210"
+    become the same value. Values that do not reduce to 10 digits are kept
+    as their digits.
+    """
+    digits = pd.Series(phones).fillna("").astype("str").str.replace(r"\D", "", regex=True)
+    digits = digits.str.replace(r"^0+", "", regex=True)
+    has_country_code = digits.str.len().eq(12) & digits.str.startswith("91")
+    return digits.mask(has_country_code, digits.str[2:])
+
+
+def normalize_emails(emails):
+    """Trims and lower-cases emails; placeholders become empty."""
+    emails = pd.Series(emails).fillna("").astype("str").str.strip().str.lower()
+    return emails.mask(emails.isin(MISSING_EMAILS), "")
+
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"), **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"), "l": "4", **dict.fromkeys("mn", "5"), "r": "6",
+}
+
+
+def soundex(name):
+    """American Soundex code of a name ("Robert" -> "R163"), '' if no letters."""
+    letters = [c for c in str(name).lower() if c.isalpha() and c.isascii()]
+    if not letters:
+        return ""
+    code = letters[0].upper()
+    previous = _SOUNDEX_CODES.get(letters[0], "")
+    for c in letters[1:]:
+        digit = _SOUNDEX_CODES.get(c, "")
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # h and w do not separate letters with the same code
+        if c not in "hw":
+            previous = digit
+    return code.ljust(4, "0")
+
+
+# =====================================================
+# MATCHING
+# =====================================================
+class _DisjointSet:
+    def __init__(self, items):
+        self.parent = {item: item for item in items}
+
+    def find(self, item):
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            # Lowest id becomes the root, i.e. the canonical row
+            self.parent[max(a, b)] = min(a, b)
+
+
+def _phone_typo(a, b):
+    # Same length, at most one digit different
+    return len(a) == len(b) == 10 and sum(x != y for x, y in zip(a, b)) <= 1
+
+
+def _is_duplicate(a, b):
+    """Fuzzy rule for two rows sharing a block (exact keys are matched before)."""
+    if SequenceMatcher(None, a["name_key"], b["name_key"]).ratio() < NAME_THRESHOLD:
+        return False
+    return (
+        (a["phone_suffix"] != "" and a["phone_suffix"] == b["phone_suffix"])
+        or (a["email_block"] != "" and a["email_block"] == b["email_block"])
+        or _phone_typo(a["phone_norm"], b["phone_norm"])
+    )
+
+
+def find_duplicate_groups(customers):
+    """
+    Clusters customer rows that refer to the same person.
+
+    Rows with the same normalized phone or email are merged by grouping
+    (linear). Fuzzy matches are only looked for inside blocks of rows
+    sharing a blocking key, so the number of comparisons grows with the
+    block sizes, not with the square of the row count:
+
+        - phone suffix (last 7 normalized digits)
+        - email domain + first 3 characters of the local part
+        - Soundex of the name
+
+    Two rows of a block match if their names are at least NAME_THRESHOLD
+    similar and they share the phone suffix or email block, or their
+    phones differ by one digit.
+
+    Args:
+        customers (pd.DataFrame): customer_id, customer_name, email, phone.
+
+    Returns:
+        pd.DataFrame: Input columns plus phone_norm, email_norm and
+            canonical_id (lowest customer_id of the row's cluster).
+    """
+    df = customers.copy()
+    df["phone_norm"] = normalize_phones(df["phone"]).to_numpy()
+    df["email_norm"] = normalize_emails(df["email"]).to_numpy()
+    df["name_key"] = (
+        df["customer_name"].fillna("").astype("str").str.lower()
+        .str.replace(r"[^a-z ]", "", regex=True).str.split().str.join(" ")
+    )
+    df["phone_suffix"] = df["phone_norm"].where(df["phone_norm"].str.len() >= 7, "").str[-7:]
+    local = df["email_norm"].str.split("@").str[0].fillna("")
+    domain = df["email_norm"].str.split("@").str[1].fillna("")
+    df["email_block"] = (domain + "/" + local.str[:3]).where(domain != "", "")
+    df["soundex"] = df["name_key"].map(soundex)
+
+    ids = [int(i) for i in df["customer_id"]]
+    groups = _DisjointSet(ids)
+
+    # Exact matches on the normalized keys
+    for column in ("phone_norm", "email_norm"):
+        keyed = df[df[column] != ""]
+        for _, members in keyed.groupby(column)["customer_id"]:
+            first, *rest = members.tolist()
+            for other in rest:
+                groups.union(first, other)
+
+    # Fuzzy matches inside each block
+    records = dict(zip(ids, df.to_dict("records")))
+    for column in ("phone_suffix", "email_block", "soundex"):
+        keyed = df[df[column] != ""]
+        for key, members in keyed.groupby(column)["customer_id"]:
+            members = [int(i) for i in members]
+            if len(members) > MAX_BLOCK_SIZE:
+                print(f"Dedup block {column}={key!r} has {len(members)} rows, skipping fuzzy matching")
+                continue
+            for a, b in combinations(members, 2):
+                if groups.find(a) != groups.find(b) and _is_duplicate(records[a], records[b]):
+                    groups.union(a, b)
+
+    df["canonical_id"] = [groups.find(i) for i in ids]
+    return df.drop(columns=["name_key", "phone_suffix", "email_block", "soundex"])
+
+
+# =====================================================
+# DEDUP STAGE
+# =====================================================
+def _main_matches(cursor, df):
+    """Main customer_id per raw row whose normalized phone or email is already in customers."""
+    phone_index = get_index("customers")
+    phone_index.refresh(cursor)
+    matches = {
+        int(row.customer_id): phone_index.get(row.phone_norm, refresh=False)
+        for row in df.itertuples()
+        if row.phone_norm != ""
+    }
+
+    emails = sorted(set(df.loc[df["email_norm"] != "", "email_norm"]))
+    email_ids = {}
+    for batch in chunked(emails, BATCH_SIZE):
+        cursor.execute(
+            f"""SELECT LOWER(email) AS email, MIN(customer_id) AS customer_id
+                FROM customers WHERE email IN ({', '.join(['%s'] * len(batch))})
+                GROUP BY LOWER(email)""",
+            batch
+        )
+        email_ids.update((row["email"], row["customer_id"]) for row in cursor.fetchall())
+    for row in df.itertuples():
+        if matches.get(int(row.customer_id)) is None and row.email_norm in email_ids:
+            matches[int(row.customer_id)] = email_ids[row.email_norm]
+
+    return {raw_id: main_id for raw_id, main_id in matches.items() if main_id is not None}
+
+
+@invalidates("customers_raw")
+def dedup_customers(batch_size=BATCH_SIZE):
+    """
+    Finds duplicate customers among the raw rows not yet migrated.
+
+    Runs between preprocessing and migration. Each cluster of duplicates
+    (see find_duplicate_groups) is resolved to one customer:
+
+        - if any row matches an existing main customer by normalized phone
+          or email, every row of the cluster is recorded in
+          customer_duplicates against that main customer_id;
+        - otherwise the lowest raw id is kept as the canonical row (its
+          phone is stored normalized) and the other rows are recorded
+          against it.
+
+    migrate_customer() skips the recorded rows and maps each of them to
+    the main customer_id of its canonical row or main match.
+
+    Returns:
+        dict: {"status", "checked", "duplicates", "matched_main"} or an
+              error dict.
+    """
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                pending = fetch_frame(
+                    cursor,
+                    """SELECT r.customer_id, r.customer_name, r.email, r.phone
+                       FROM customers_raw r
+                       LEFT JOIN customer_mapping done ON done.raw_customer_id = r.customer_id
+                       WHERE done.raw_customer_id IS NULL"""
+                )
+                if pending.empty:
+                    return {"status": "success", "checked": 0, "duplicates": 0, "matched_main": 0}
+
+                df = find_duplicate_groups(pending)
+                main_ids = _main_matches(cursor, df)
+
+                # Whole cluster follows the main customer any member matched
+                canonical_of = {int(r): int(c) for r, c in zip(df["customer_id"], df["canonical_id"])}
+                cluster_main = {}
+                for raw_id, main_id in main_ids.items():
+                    canonical = canonical_of[raw_id]
+                    cluster_main[canonical] = min(main_id, cluster_main.get(canonical, main_id))
+
+                duplicates = []
+                canonical_rows = []
+                for row in df.itertuples():
+                    raw_id, canonical = int(row.customer_id), int(row.canonical_id)
+                    main_id = cluster_main.get(canonical)
+                    if main_id is not None:
+                        duplicates.append((raw_id, None, main_id))
+                    elif canonical != raw_id:
+                        duplicates.append((raw_id, canonical, None))
+                    else:
+                        canonical_rows.append(row)
+
+                # Store canonical phones normalized, unless another raw row
+                # already holds that exact value
+                raw_index = get_index("customers_raw")
+                phone_updates = [
+                    (int(row.customer_id), row.phone_norm)
+                    for row in canonical_rows
+                    if len(row.phone_norm) == 10 and row.phone_norm != str(row.phone)
+                    and raw_index.get(row.phone_norm) in (None, row.customer_id)
+                ]
+
+                # Earlier decisions for still pending rows are recomputed
+                cursor.execute(
+                    """DELETE d FROM customer_duplicates d
+                       LEFT JOIN customer_mapping done ON done.raw_customer_id = d.raw_customer_id
+                       WHERE done.raw_customer_id IS NULL"""
+                )
+                batch_insert(cursor, "customer_duplicates",
+                             ["raw_customer_id", "canonical_raw_id", "main_customer_id"],
+                             duplicates, batch_size)
+                batch_update(cursor, "customers_raw", "customer_id", ["phone"], phone_updates, batch_size)
+                conn.commit()
+            finally:
+                cursor.close()
+
+        if phone_updates:
+            invalidate_index("customers_raw")
+        return {
+            "status": "success",
+            "checked": len(df),
+            "duplicates": len(duplicates),
+            "matched_main": sum(1 for d in duplicates if d[2] is not None),
+        }
+
+    except (Error, ConnectionError) as e:
+        return {"status": "error", "message": str(e)}
@@ -0,0 +1,76 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+def _run_timed(func):
+    """Runs one stage and records its wall time and outcome."""
+    start = time.perf_counter()
+    try:
+        result = func()
+        return {"result": result, "seconds": round(time.perf_counter() - start, 3)}
+    except Exception as e:
+        return {"error": str(e), "seconds": round(time.perf_counter() - start, 3)}
+
+
+def run_stages(stages, max_workers=4):
+    """
+    Runs named stages concurrently while respecting their dependencies.
+
+    A stage starts as soon as every stage it depends on has finished, so
+    independent stages overlap. Each stage runs in its own worker thread
+    and is expected to take its own pooled connection. A stage whose
+    dependency raised is not run.
+
+    Args:
+        stages (dict): name -> (callable, list of dependency names).
+        max_workers (int): Maximum number of stages running at once.
+
+    Returns:
+        dict: name -> {"result": ..., "seconds": float} for stages that ran,
+              or {"error": str, "seconds": float} for stages that raised or
+              were skipped.
+
+    Raises:
+        ValueError: If a dependency is unknown or the stages form a cycle.
+    """
+    for name, (_, deps) in stages.items():
+        for dep in deps:
+            if dep not in stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+
+    results = {}
+    pending = dict(stages)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            # Start (or skip) every stage whose dependencies are done
+            progressed = True
+            while progressed:
+                progressed = False
+                for name in list(pending):
+                    func, deps = pending[name]
+                    if not all(dep in results for dep in deps):
+                        continue
+                    del pending[name]
+                    progressed = True
+
+                    failed = [dep for dep in deps if "error" in results[dep]]
+                    if failed:
+                        results[name] = {
+                            "error": f"skipped, dependency failed: {', '.join(failed)}",
+                            "seconds": 0.0,
+                        }
+                    else:
+                        running[pool.submit(_run_timed, func)] = name
+
+            if not running:
+                if pending:
+                    raise ValueError(f"Dependency cycle between stages: {', '.join(pending)}")
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+
+    return results
@@ -0,0 +1,327 @@
+"""
+Streaming CSV / Parquet export of the main and raw tables.
+
+Rows are read from the database in keyset chunks and encoded chunk by
+chunk, so memory use stays at one chunk whatever the table size. The
+iter_* functions yield the encoded file piece by piece (for a streaming
+response or a pipe); export_table() writes it to a file.
+
+Example:
+    python -m utils.data_export orders_raw orders.parquet --format parquet \\
+        --date-from 2024-01-01 --columns order_id,customer_id,order_date
+"""
+import argparse
+import glob
+import io
+import os
+import sys
+import time
+from datetime import datetime
+from dotenv import load_dotenv
+from mysql.connector import Error
+from utils.database_connection import get_connection
+from utils.batch_operations import CHUNK_SIZE
+from utils.columnar_fetch import fetch_frames_in_chunks
+from utils.database_retrieve_operations import get_table_schema
+
+# Loading environment variables
+load_dotenv()
+
+# Folder the View Data page writes export files to, and how long
+# (seconds) a file is kept there for download before prune_exports()
+EXPORT_DIR = os.getenv("EXPORT_DIR", "exports")
+EXPORT_MAX_AGE = float(os.getenv("EXPORT_MAX_AGE", 3600))
+
+# Largest file the View Data page offers for download. Streamlit's
+# download button holds the whole file in server memory, and the download
+# only starts once the file is complete; bigger exports go through the
+# command line below, which streams to disk in constant memory.
+EXPORT_DOWNLOAD_MAX_MB = int(os.getenv("EXPORT_DOWNLOAD_MAX_MB", 100))
+
+# table -> (primary key, date column used by the date-range filter)
+EXPORT_TABLES = {
+    "customers": ("customer_id", "created_at"),
+    "products": ("product_id", "added_at"),
+    "orders": ("order_id", "order_date"),
+    "sales": ("sale_id", "sale_date"),
+    "customers_raw": ("customer_id", "created_at"),
+    "products_raw": ("product_id", "added_at"),
+    "orders_raw": ("order_id", "order_date"),
+    "sales_raw": ("sale_id", "sale_date"),
+}
+
+EXPORT_FORMATS = ("csv", "parquet")
+
+
+# =====================================================
+# SOURCE
+# =====================================================
+def _date_filter(date_column, date_from, date_to):
+    # date_from <= date < date_to, like the bulk delete filters
+    conditions = []
+    params = []
+    if date_from is not None:
+        conditions.append(f"`{date_column}` >= %s")
+        params.append(date_from)
+    if date_to is not None:
+        conditions.append(f"`{date_column}` < %s")
+        params.append(date_to)
+    return " AND ".join(conditions) or "TRUE", params
+
+
+def _export_columns(table_name, columns):
+    if table_name not in EXPORT_TABLES:
+        raise ValueError(f"Cannot export '{table_name}', expected one of {list(EXPORT_TABLES)}")
+    all_columns, _ = get_table_schema(table_name)
+    columns = list(columns or all_columns)
+    unknown = [c for c in columns if c not in all_columns]
+    if unknown:
+        raise ValueError(f"Unknown column(s) for {table_name}: {', '.join(unknown)}")
+    return columns
+
+
+def iter_frames(table_name, columns=None, date_from=None, date_to=None, chunk_size=CHUNK_SIZE):
+    """
+    Streams a table as DataFrame chunks in primary-key order.
+
+    Args:
+        table_name (str): One of EXPORT_TABLES.
+        columns (list of str, optional): Columns to export (default all),
+            selected in the query itself.
+        date_from, date_to (date or datetime, optional): Keep rows with
+            date_from <= date column < date_to.
+        chunk_size (int): Rows per chunk.
+
+    Yields:
+        pd.DataFrame: The next chunk, with exactly the requested columns.
+
+    Raises:
+        ValueError: For unknown tables or columns.
+    """
+    columns = _export_columns(table_name, columns)
+    key_column, date_column = EXPORT_TABLES[table_name]
+
+    where, params = _date_filter(date_column, date_from, date_to)
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            for df in fetch_frames_in_chunks(cursor, table_name, key_column, columns,
+                                             where, chunk_size, params):
+                # The key is always read for the keyset scan; drop it if
+                # it was not asked for
+                yield df[columns]
+        finally:
+            cursor.close()
+
+
+# =====================================================
+# ENCODERS
+# =====================================================
+def iter_csv(table_name, columns=None, date_from=None, date_to=None,
+             chunk_size=CHUNK_SIZE, on_chunk=None):
+    """
+    Yields a UTF-8 CSV export of a table, one encoded chunk at a time.
+
+    The header is sent before the first row is read, so a download can
+    start right away. on_chunk(rows_so_far) is called after each chunk.
+    Arguments are those of iter_frames().
+    """
+    columns = _export_columns(table_name, columns)
+    yield (",".join(columns) + "\n").encode("utf-8")
+    rows = 0
+    for df in iter_frames(table_name, columns, date_from, date_to, chunk_size):
+        yield df.to_csv(index=False, header=False).encode("utf-8")
+        rows += len(df)
+        if on_chunk:
+            on_chunk(rows)
+
+
+def _arrow_type(pa, data_type, precision, scale):
+    if data_type in ("tinyint", "smallint", "mediumint", "int", "bigint", "year"):
+        return pa.int64()
+    if data_type == "decimal":
+        return pa.decimal128(int(precision), int(scale))
+    if data_type in ("float", "double"):
+        return pa.float64()
+    if data_type in ("datetime", "timestamp"):
+        return pa.timestamp("us")
+    if data_type == "date":
+        return pa.date32()
+    return pa.string()
+
+
+def _arrow_schema(pa, table_name, columns):
+    # From the table definition, not from the data: every chunk converts
+    # to the same types whatever values (or NULLs) it happens to hold
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                """SELECT COLUMN_NAME, DATA_TYPE, NUMERIC_PRECISION, NUMERIC_SCALE
+                   FROM information_schema.COLUMNS
+                   WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s""",
+                (table_name,)
+            )
+            types = {name: _arrow_type(pa, data_type.lower(), precision, scale)
+                     for name, data_type, precision, scale in cursor.fetchall()}
+        finally:
+            cursor.close()
+    return pa.schema([(c, types[c]) for c in columns])
+
+
+class _Spool(io.RawIOBase):
+    # Write-only sink for ParquetWriter; drain() hands over what was
+    # written since the last call
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def iter_parquet(table_name, columns=None, date_from=None, date_to=None,
+                 chunk_size=CHUNK_SIZE, on_chunk=None):
+    """
+    Yields a zstd-compressed Parquet export of a table, one row group per
+    chunk. Needs the optional pyarrow package.
+
+    The schema comes from the table's column types (DECIMAL(p,s) as
+    decimal128(p,s), integers as int64, DATETIME as timestamp, the rest
+    as string). Arguments are those of iter_csv().
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = _export_columns(table_name, columns)
+    schema = _arrow_schema(pa, table_name, columns)
+    spool = _Spool()
+    writer = pq.ParquetWriter(spool, schema, compression="zstd")
+    rows = 0
+    try:
+        for df in iter_frames(table_name, columns, date_from, date_to, chunk_size):
+            writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+            rows += len(df)
+            if on_chunk:
+                on_chunk(rows)
+            yield spool.drain()
+    finally:
+        writer.close()
+    yield spool.drain()
+
+
+# =====================================================
+# FILE EXPORT
+# =====================================================
+def export_table(table_name, path, fmt="csv", columns=None, date_from=None, date_to=None,
+                 chunk_size=CHUNK_SIZE, on_chunk=None, max_bytes=None):
+    """
+    Writes a CSV or Parquet export of a table to path, chunk by chunk.
+
+    The file is written under a temporary name and renamed when complete,
+    so a failed export never leaves a truncated file at path. With
+    max_bytes, the export stops with an error as soon as the file grows
+    past that size.
+
+    Returns:
+        dict: {"status", "rows", "path", "bytes"} or an error dict.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of {EXPORT_FORMATS}")
+    encoder = iter_csv if fmt == "csv" else iter_parquet
+    rows = 0
+
+    def count(rows_so_far):
+        nonlocal rows
+        rows = rows_so_far
+        if on_chunk:
+            on_chunk(rows_so_far)
+
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    partial = path + ".part"
+    try:
+        with open(partial, "wb") as f:
+            for data in encoder(table_name, columns, date_from, date_to, chunk_size, count):
+                f.write(data)
+                if max_bytes is not None and f.tell() > max_bytes:
+                    raise ValueError(
+                        f"Export is larger than {max_bytes / 1024 / 1024:.0f} MB; "
+                        f"run python -m utils.data_export {table_name} <file> instead"
+                    )
+        os.replace(partial, path)
+        return {"status": "success", "rows": rows, "path": path, "bytes": os.path.getsize(path)}
+
+    except (Error, ConnectionError, ImportError, OSError, ValueError, TypeError) as e:
+        # TypeError / ValueError include pyarrow's conversion errors
+        if os.path.exists(partial):
+            os.remove(partial)
+        return {"status": "error", "message": str(e), "rows": rows}
+
+
+def export_path(table_name, fmt):
+    """Default file name for an export under EXPORT_DIR."""
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    return os.path.join(EXPORT_DIR, f"{table_name}-{stamp}.{fmt}")
+
+
+def prune_exports(max_age=EXPORT_MAX_AGE):
+    """Deletes files under EXPORT_DIR older than max_age seconds; returns how many."""
+    removed = 0
+    cutoff = time.time() - max_age
+    for path in glob.glob(os.path.join(EXPORT_DIR, "*")):
+        try:
+            if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            # Already removed by another session
+            pass
+    return removed
+
+
+def _parse_date(value):
+    return datetime.fromisoformat(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a table to CSV or Parquet in chunks.")
+    parser.add_argument("table", choices=list(EXPORT_TABLES))
+    parser.add_argument("path", help="Output file")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--columns", help="Comma-separated columns (default all)")
+    parser.add_argument("--date-from", type=_parse_date, help="Rows dated on/after this (YYYY-MM-DD[ HH:MM:SS])")
+    parser.add_argument("--date-to", type=_parse_date, help="Rows dated before this")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Rows read per query")
+    args = parser.parse_args(argv)
+
+    columns = [c.strip() for c in args.columns.split(",")] if args.columns else None
+    result = export_table(args.table, args.path, args.format, columns,
+                          args.date_from, args.date_to, args.chunk_size)
+    if result["status"] == "error":
+        print(f"Export failed after {result['rows']} row(s): {result['message']}")
+        return 1
+    print(f"Exported {result['rows']} row(s) to {result['path']} ({result['bytes']} bytes)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,319 +1,616 @@
-from utils.database_connection import create_connection
-from mysql.connector import Error
-import pandas as pd
-
-def migrate_customer():
-    conn = create_connection()
-    cursor = conn.cursor(dictionary=True)
-    inserted_count = 0
-    skipped_count = 0
-
-    try:
-        # Load raw customers
-        cursor.execute("SELECT * FROM customers_raw")
-        customer_raw_df = pd.DataFrame(cursor.fetchall())
-
-        # Load main customers
-        cursor.execute("SELECT * FROM customers")
-        customer_main_df = pd.DataFrame(cursor.fetchall())
-
-        # Case 1: Main table empty → insert all
-        if customer_main_df.empty:
-            for idx, row in customer_raw_df.iterrows():
-                cursor.execute(
-                    "INSERT INTO customers (customer_name, email, phone, city) VALUES (%s, %s, %s, %s)",
-                    (row['customer_name'], row['email'], row['phone'], row['city'])
-                )
-                main_id = cursor.lastrowid   #last row id (primary key column)
-                # Update mapping table
-                cursor.execute(
-                    "INSERT INTO customer_mapping (raw_customer_id, main_customer_id) VALUES (%s, %s)",
-                    (row['customer_id'], main_id)
-                )
-                inserted_count += 1
-
-        # Case 2: Main table has existing customers
-        else:
-            # set of existing phone numbers for quick lookup
-            existing_phones = set(customer_main_df['phone'])
-
-            for idx, row in customer_raw_df.iterrows():
-                phone = row['phone']
-                raw_id = row['customer_id']
-
-                # Skip if phone already exists
-                if phone in existing_phones:
-                    skipped_count += 1
-                    continue
-
-                # Insert new customer
-                cursor.execute(
-                    "INSERT INTO customers (customer_name, email, phone, city) VALUES (%s, %s, %s, %s)",
-                    (row['customer_name'], row['email'], phone, row['city'])
-                )
-                main_id = cursor.lastrowid
-                existing_phones.add(phone)
-                inserted_count += 1
-
-                # Update mapping table
-                cursor.execute(
-                    "INSERT INTO customer_mapping (raw_customer_id, main_customer_id) VALUES (%s, %s)",
-                    (raw_id, main_id)
-                )
-
+from utils.database_connection import get_connection
+from utils.batch_operations import BATCH_SIZE, batch_insert
+from utils.dag_executor import run_stages
+from utils.natural_key_index import get_index, normalize_key
+from utils.customer_dedup import dedup_customers
+from utils.query_cache import invalidates
+from mysql.connector import Error, errorcode
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+# Errors worth retrying a batch for: lock conflicts and dropped connections
+TRANSIENT_ERRORS = {
+    errorcode.ER_LOCK_DEADLOCK,
+    errorcode.ER_LOCK_WAIT_TIMEOUT,
+    errorcode.CR_SERVER_GONE_ERROR,
+    errorcode.CR_SERVER_LOST,
+    errorcode.CR_CONN_HOST_ERROR,
+}
+MAX_RETRIES = 3
+RETRY_DELAY = 1.0
+
+# =====================================================
+# CHECKPOINTS
+# One row per stage in migration_checkpoint holds the last raw id whose
+# batch was committed. It is written in the same transaction as the
+# batch, and removed when the stage finishes.
+# =====================================================
+def _load_checkpoint(stage):
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT last_raw_id FROM migration_checkpoint WHERE stage=%s", (stage,))
+        row = cursor.fetchone()
+        cursor.close()
+    return row["last_raw_id"] if row else None
+
+def _save_checkpoint(cursor, stage, last_raw_id):
+    cursor.execute(
+        """INSERT INTO migration_checkpoint (stage, last_raw_id) VALUES (%s, %s)
+           ON DUPLICATE KEY UPDATE last_raw_id = VALUES(last_raw_id)""",
+        (stage, last_raw_id)
+    )
+
+def _clear_checkpoint(stage):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM migration_checkpoint WHERE stage=%s", (stage,))
         conn.commit()
-        return {"status": "success", "inserted": inserted_count, "skipped": skipped_count}
-
-    except Error as e:
-        return {"status": "error", "message": str(e)}
-
-    finally:
         cursor.close()
-        conn.close()
-
-def migrate_product():
-    conn = create_connection()
-    cursor = conn.cursor(dictionary=True)
-    inserted_count = 0
-    skipped_count = 0
-
-    try:
-        # Load raw products
-        cursor.execute("SELECT * FROM products_raw")
-        product_raw_df = pd.DataFrame(cursor.fetchall())
-
-        # Load main products
-        cursor.execute("SELECT * FROM products")
-        product_main_df = pd.DataFrame(cursor.fetchall())
-
-        # Case 1: Main table empty → insert all
-        if product_main_df.empty:
-            for idx, row in product_raw_df.iterrows():
-                cursor.execute(
-                    "INSERT INTO products (product_name, category, selling_price, cost_price, stock) "
-                    "VALUES (%s, %s, %s, %s, %s)",
-                    (row['product_name'], row['category'], row['selling_price'], row['cost_price'], row['stock'])
-                )
-                main_id = cursor.lastrowid
-
-                # Update mapping table
-                cursor.execute(
-                    "INSERT INTO product_mapping (raw_product_id, main_product_id) VALUES (%s, %s)",
-                    (row['product_id'], main_id)
-                )
-                inserted_count += 1
-
-        # Case 2: Main table has existing products
-        else:
-            # Set of existing product names
-            existing_products = set(product_main_df['product_name'])
-
-            for idx, row in product_raw_df.iterrows():
-                product_name = row['product_name']
-                raw_id = row['product_id']
-
-                # Skip if product already exists
-                if product_name in existing_products:
-                    skipped_count += 1
-                    continue
-
-                # Insert new product
-                cursor.execute(
-                    "INSERT INTO products (product_name, category, selling_price, cost_price, stock) "
-                    "VALUES (%s, %s, %s, %s, %s)",
-                    (product_name, row['category'], row['selling_price'], row['cost_price'], row['stock'])
-                )
-                main_id = cursor.lastrowid
-                existing_products.add(product_name)
-                inserted_count += 1
-
-                # Insert mapping
-                cursor.execute(
-                    "INSERT INTO product_mapping (raw_product_id, main_product_id) VALUES (%s, %s)",
-                    (raw_id, main_id)
-                )
 
+def _clear_shard_checkpoints(raw_table):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM migration_checkpoint WHERE stage LIKE %s", (f"{raw_table}:%",))
         conn.commit()
-        return {"status": "success", "inserted": inserted_count, "skipped": skipped_count}
-
-    except Error as e:
-        return {"status": "error", "message": str(e)}
-
-    finally:
         cursor.close()
-        conn.close()
 
-def migrate_order():
-    conn = create_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
-        # Loading raw orders
-        cursor.execute("SELECT * FROM orders_raw")
-        order_raw = pd.DataFrame(cursor.fetchall())
-
-        # Loading mapping tables
-        cursor.execute("SELECT * FROM customer_mapping")
-        customer_map = pd.DataFrame(cursor.fetchall())
-
-        cursor.execute("SELECT * FROM product_mapping")
-        product_map = pd.DataFrame(cursor.fetchall())
-
-        # Converting mapping rows to dictionaries for fast lookup
-        customer_lookup = dict(zip(customer_map['raw_customer_id'], customer_map['main_customer_id']))
-        product_lookup = dict(zip(product_map['raw_product_id'], product_map['main_product_id']))
-
-        for idx, row in order_raw.iterrows():
-
-            raw_order_id = row['order_id']         # raw PK
-            raw_cid = row['customer_id']
-            raw_pid = row['product_id']
+def _interrupted_shards(raw_table):
+    # Shard checkpoints are named "<raw_table>:<first id>-<last id>"
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            "SELECT stage FROM migration_checkpoint WHERE stage LIKE %s",
+            (f"{raw_table}:%",)
+        )
+        stages = [row["stage"] for row in cursor.fetchall()]
+        cursor.close()
+    return [tuple(int(i) for i in stage.split(":", 1)[1].split("-")) for stage in stages]
+
+# =====================================================
+# BATCH RUNNER
+# =====================================================
+def _run_batches(stage, process_batch, resume=True, start_after=0):
+    """
+    Runs a migration stage as a series of independently committed batches.
+
+    process_batch(cursor, after_id) migrates the next batch of raw rows
+    with id > after_id and returns {"rows", "inserted", "last_id"}, or None
+    when nothing is left. Each batch runs on its own pooled connection and
+    commits together with the stage checkpoint, so a crash or Ctrl-C loses
+    at most the batch in flight and the next run resumes after the last
+    committed one. Transient errors are retried per batch.
+
+    start_after is the id the stage starts after when there is no
+    checkpoint to resume from.
+
+    Returns:
+        dict: Totals and throughput for the stage.
+    """
+    checkpoint = _load_checkpoint(stage) if resume else None
+    last_id = start_after if checkpoint is None else checkpoint
+    resumed_from = checkpoint
+    totals = {"rows": 0, "inserted": 0}
+    batch_rates = []
+    start = time.perf_counter()
+
+    while True:
+        for attempt in range(1, MAX_RETRIES + 1):
+            try:
+                with get_connection() as conn:
+                    cursor = conn.cursor(dictionary=True)
+                    try:
+                        batch_start = time.perf_counter()
+                        result = process_batch(cursor, last_id)
+                        if result is not None:
+                            _save_checkpoint(cursor, stage, result["last_id"])
+                        conn.commit()
+                        batch_seconds = time.perf_counter() - batch_start
+                    finally:
+                        cursor.close()
+                break
+            except (Error, ConnectionError) as e:
+                transient = isinstance(e, ConnectionError) or e.errno in TRANSIENT_ERRORS
+                if not transient or attempt == MAX_RETRIES:
+                    raise
+                print(f"Transient error in {stage} batch after id {last_id} "
+                      f"(attempt {attempt}/{MAX_RETRIES}): {e}")
+                time.sleep(RETRY_DELAY * attempt)
+
+        if result is None:
+            break
+        totals["rows"] += result["rows"]
+        totals["inserted"] += result["inserted"]
+        batch_rates.append(result["rows"] / batch_seconds if batch_seconds > 0 else 0.0)
+        last_id = result["last_id"]
+
+    _clear_checkpoint(stage)
+    seconds = time.perf_counter() - start
+    return {
+        **totals,
+        "resumed_from_id": resumed_from,
+        "batches": len(batch_rates),
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(totals["rows"] / seconds, 1) if seconds > 0 else 0.0,
+        "batch_rows_per_sec": {
+            "min": round(min(batch_rates), 1) if batch_rates else 0.0,
+            "avg": round(sum(batch_rates) / len(batch_rates), 1) if batch_rates else 0.0,
+            "max": round(max(batch_rates), 1) if batch_rates else 0.0,
+        },
+    }
 
-            # Fetch mapped main IDs
-            c_main_id = customer_lookup.get(raw_cid)
-            p_main_id = product_lookup.get(raw_pid)
+def _plan_shards(raw_table, mapping_table, key_column, shards):
+    """
+    Splits the raw rows not yet migrated into id ranges of equal row count.
+
+    Returns:
+        list of tuple: (first id, last id) per non-empty shard.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            f"""SELECT MIN(raw_id) AS first_id, MAX(raw_id) AS last_id
+                FROM (
+                    SELECT r.{key_column} AS raw_id,
+                           NTILE(%s) OVER (ORDER BY r.{key_column}) AS shard
+                    FROM {raw_table} r
+                    LEFT JOIN {mapping_table} done ON done.raw_{key_column} = r.{key_column}
+                    WHERE done.raw_{key_column} IS NULL
+                ) pending
+                GROUP BY shard
+                ORDER BY shard""",
+            (shards,)
+        )
+        ranges = [(row["first_id"], row["last_id"]) for row in cursor.fetchall()]
+        cursor.close()
+    return ranges
+
+def _merge_stats(parts, seconds):
+    # Combines the _run_batches() results of shards that ran side by side
+    batches = sum(p["batches"] for p in parts)
+    rows = sum(p["rows"] for p in parts)
+    ran = [p for p in parts if p["batches"]]
+    return {
+        "rows": rows,
+        "inserted": sum(p["inserted"] for p in parts),
+        "shards": len(parts),
+        "batches": batches,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows / seconds, 1) if seconds > 0 else 0.0,
+        "batch_rows_per_sec": {
+            "min": min((p["batch_rows_per_sec"]["min"] for p in ran), default=0.0),
+            "avg": round(sum(p["batch_rows_per_sec"]["avg"] * p["batches"] for p in ran) / batches, 1)
+                   if batches else 0.0,
+            "max": max((p["batch_rows_per_sec"]["max"] for p in ran), default=0.0),
+        },
+    }
 
-            # If mapping missing → skip
-            if c_main_id is None or p_main_id is None:
+def _run_sharded(raw_table, mapping_table, key_column, make_batch, resume=True, shards=1):
+    """
+    Runs a migration stage as id-range shards processed in parallel.
+
+    The pending raw rows are split into shards of equal row count, each
+    migrated by _run_batches() on its own worker thread and pooled
+    connection, with its own checkpoint. Main ids are reserved per batch
+    in a separate short transaction (_reserve_ids), so shards do not wait
+    on each other's inserts. Shards left unfinished by an interrupted run
+    are resumed first, then whatever is still pending is re-planned, so
+    rows outside the old ranges are not missed; with resume=False their
+    checkpoints are dropped instead.
+
+    Args:
+        make_batch (callable): (first id, last id) -> process_batch
+            restricted to that id range.
+        shards (int): Number of shards (and worker threads).
+    """
+    start = time.perf_counter()
+    parts = []
+
+    def run(ranges):
+        with ThreadPoolExecutor(max_workers=max(len(ranges), 1)) as pool:
+            futures = [
+                pool.submit(_run_batches, f"{raw_table}:{first}-{last}",
+                            make_batch(first, last), resume, first - 1)
+                for first, last in ranges
+            ]
+            # result() re-raises the first shard failure
+            parts.extend(f.result() for f in futures)
+
+    if resume:
+        run(_interrupted_shards(raw_table))
+    else:
+        # A fresh run re-plans everything; old range checkpoints would
+        # otherwise be picked up by the next resumed run
+        _clear_shard_checkpoints(raw_table)
+    run(_plan_shards(raw_table, mapping_table, key_column, shards))
+
+    return _merge_stats(parts, time.perf_counter() - start)
+
+# =====================================================
+# CUSTOMERS & PRODUCTS (deduplicated on a natural key)
+# =====================================================
+def _natural_key_batch(raw_table, main_table, mapping_table, key_column,
+                       natural_key, columns, batch_size, exclude=None, map_existing=False):
+    """
+    Builds the batch function migrating raw rows whose natural key is not
+    yet in the main table.
+
+    Only raw rows without a mapping entry are read (anti-join on the
+    mapping table), and each one's natural key is checked against the
+    shared natural-key index of the main table, which is brought up to
+    date at the start of every batch by reading only the rows added since
+    its last refresh. Keys are compared with normalize_key(), which
+    follows the column collation on trimmed values; the natural key is
+    trimmed when inserted and in the mapping join so both agree with it.
+    Re-running on unchanged data does almost no work.
+
+    New rows are inserted with one multi-row INSERT. Instead of reading
+    lastrowid per row, the batch's raw -> main id pairs are derived
+    server-side by joining on the natural key and written to the mapping
+    table with one INSERT ... SELECT. With map_existing, raw rows whose key
+    is already in the main table are mapped to that row as well.
+
+    Args:
+        raw_table / main_table / mapping_table (str): Tables involved.
+        key_column (str): Primary key name, shared by the raw and main
+            tables (mapping columns are raw_<key> and main_<key>).
+        natural_key (str): Unique business key, e.g. phone or product_name.
+        columns (list of str): Columns copied from raw to main.
+        batch_size (int): Raw rows per batch.
+        exclude (str, optional): SQL predicate over r for raw rows that are
+            mapped by another step and must not be inserted.
+        map_existing (bool): Also map raw rows whose key already exists;
+            needs a mapping table that allows several raw rows per main id.
+    """
+    index = get_index(main_table)
+    excluded = f"AND NOT ({exclude})" if exclude else ""
+
+    def process_batch(cursor, after_id):
+        cursor.execute(
+            f"""SELECT {', '.join(f"r.{c}" for c in [key_column] + columns)}
+                FROM {raw_table} r
+                LEFT JOIN {mapping_table} done ON done.raw_{key_column} = r.{key_column}
+                WHERE done.raw_{key_column} IS NULL AND r.{key_column} > %s {excluded}
+                ORDER BY r.{key_column}
+                LIMIT %s""",
+            (after_id, batch_size)
+        )
+        raw_rows = cursor.fetchall()
+        if not raw_rows:
+            return None
+
+        # Skip keys already in the main table (or earlier in this batch);
+        # earlier batches are committed, so the refresh picks them up
+        index.refresh(cursor)
+        seen_keys = set()
+        new_rows = []
+        for row in raw_rows:
+            key = normalize_key(row[natural_key])
+            if key in seen_keys or index.get(row[natural_key], refresh=False) is not None:
                 continue
-
-            # Insert into main orders table (duplicate orders allowed)
+            seen_keys.add(key)
+            new_rows.append(row)
+
+        if new_rows:
+            # Keys are stored trimmed, so the mapping join below can use
+            # the main table's index on the natural key
+            batch_insert(cursor, main_table, columns,
+                         [tuple(r[c].strip() if c == natural_key and isinstance(r[c], str) else r[c]
+                                for c in columns) for r in new_rows], batch_size)
+
+        mapped_rows = raw_rows if map_existing else new_rows
+        raw_ids = [r[key_column] for r in mapped_rows if r[natural_key] is not None]
+        if raw_ids:
             cursor.execute(
-                """INSERT INTO orders 
-                   (customer_id, product_id, quantity, order_status, payment_method)
-                   VALUES (%s, %s, %s, %s, %s)""",
-                (c_main_id, p_main_id, row['quantity'], row['order_status'], row['payment_method'])
-            )
-
-            # Get new main order ID
-            main_order_id = cursor.lastrowid
-
-            # Inserting mapping into order_mapping
-            cursor.execute(
-                """INSERT INTO order_mapping (raw_order_id, main_order_id)
-                   VALUES (%s, %s)""",
-                (raw_order_id, main_order_id)
+                f"""INSERT INTO {mapping_table} (raw_{key_column}, main_{key_column})
+                    SELECT r.{key_column}, m.{key_column}
+                    FROM {raw_table} r
+                    JOIN {main_table} m ON m.{natural_key} = TRIM(r.{natural_key})
+                    WHERE r.{key_column} IN ({', '.join(['%s'] * len(raw_ids))})""",
+                raw_ids
             )
 
+        return {"rows": len(raw_rows), "inserted": len(new_rows), "last_id": raw_rows[-1][key_column]}
+
+    return process_batch
+
+def _map_customer_duplicates():
+    # Rows dedup_customers() recorded as duplicates follow their canonical
+    # raw row (once migrated) or the main customer they matched
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """INSERT INTO customer_mapping (raw_customer_id, main_customer_id)
+               SELECT d.raw_customer_id, COALESCE(d.main_customer_id, cm.main_customer_id)
+               FROM customer_duplicates d
+               LEFT JOIN customer_mapping cm ON cm.raw_customer_id = d.canonical_raw_id
+               LEFT JOIN customer_mapping done ON done.raw_customer_id = d.raw_customer_id
+               WHERE done.raw_customer_id IS NULL
+                 AND COALESCE(d.main_customer_id, cm.main_customer_id) IS NOT NULL"""
+        )
+        merged = cursor.rowcount
         conn.commit()
-        return {"status": "success", "message": "Orders migrated & mapping updated"}
-
-    except Error as e:
-        return {"status": "error", "message": str(e)}
-
-    finally:
         cursor.close()
-        conn.close()
+    return merged
 
-def migrate_sales():
-    conn = create_connection()
-    cursor = conn.cursor(dictionary=True)
-    
+@invalidates("customers", "customer_mapping")
+def migrate_customer(batch_size=BATCH_SIZE, resume=True):
+    # Customers are deduplicated on phone; raw rows with a phone already in
+    # customers, and duplicates found by dedup_customers(), are mapped to
+    # the existing main customer
     try:
-        # Loading raw sales
-        cursor.execute("SELECT * FROM sales_raw")
-        sales_raw = pd.DataFrame(cursor.fetchall())
-
-        # Loading mapping table (order → main order)
-        cursor.execute("SELECT * FROM order_mapping")
-        order_map = pd.DataFrame(cursor.fetchall())
-
-        # lookup dictionary: raw_order_id → main_order_id
-        order_lookup = dict(zip(order_map['raw_order_id'], order_map['main_order_id']))
-
-        for idx, row in sales_raw.iterrows():
-
-            raw_sale_id = row['sale_id']    # raw PK
-            raw_oid = row['order_id']       # raw order_id
-
-            # Getting mapped main order_id
-            main_order_id = order_lookup.get(raw_oid)
+        stats = _run_batches("customers_raw", _natural_key_batch(
+            "customers_raw", "customers", "customer_mapping", "customer_id",
+            "phone", ["customer_name", "email", "phone", "city"], batch_size,
+            exclude="EXISTS (SELECT 1 FROM customer_duplicates d WHERE d.raw_customer_id = r.customer_id)",
+            map_existing=True
+        ), resume)
+        merged = _map_customer_duplicates()
+        return {"status": "success", "inserted": stats["inserted"],
+                "skipped": stats["rows"] - stats["inserted"], "merged": merged,
+                "throughput": stats}
+
+    except (Error, ConnectionError) as e:
+        return {"status": "error", "message": str(e)}
 
-            # Skip if mapping missing
-            if main_order_id is None:
-                continue
+@invalidates("products", "product_mapping")
+def migrate_product(batch_size=BATCH_SIZE, resume=True):
+    # Products are deduplicated on product_name; raw rows with a name
+    # already in products are mapped to the existing product, so their
+    # orders migrate and re-runs do not read them again
+    try:
+        stats = _run_batches("products_raw", _natural_key_batch(
+            "products_raw", "products", "product_mapping", "product_id",
+            "product_name", ["product_name", "category", "selling_price", "cost_price", "stock"], batch_size,
+            map_existing=True
+        ), resume)
+        return {"status": "success", "inserted": stats["inserted"],
+                "skipped": stats["rows"] - stats["inserted"], "throughput": stats}
+
+    except (Error, ConnectionError) as e:
+        return {"status": "error", "message": str(e)}
 
-            # Inserting into main sales table (duplicates allowed)
+# =====================================================
+# ORDERS & SALES (foreign keys resolved through mapping tables)
+# =====================================================
+def _reserve_ids(main_table, mapping_table, key_column, count):
+    """
+    Reserves count consecutive main ids and returns the first one.
+
+    Ids come from the table's row in id_sequence, which only moves
+    forward, so ids of main rows deleted since are never handed out
+    again (the mapping tables may still reference them). The sequence is
+    kept above both the main table's and the mapping table's highest id,
+    which covers rows written outside the migration and the first run.
+
+    The reservation is a single upsert committed on its own connection,
+    so the sequence row is locked only for that statement and shards
+    write their batches in parallel. Ids of a batch that later fails are
+    skipped, like AUTO_INCREMENT values.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
             cursor.execute(
-                """INSERT INTO sales 
-                   (order_id, sale_amount, profit, region)
-                   VALUES (%s, %s, %s, %s)""",
-                (main_order_id, row['sale_amount'], row['profit'], row['region'])
+                f"""SELECT GREATEST(
+                        (SELECT COALESCE(MAX({key_column}), 0) FROM {main_table}),
+                        (SELECT COALESCE(MAX(main_{key_column}), 0) FROM {mapping_table})
+                    ) + 1"""
             )
-
-            # Get newly inserted sale_id (main table)
-            main_sale_id = cursor.lastrowid
-
-            # Insert into sale_mapping
+            floor_id = cursor.fetchone()[0]
             cursor.execute(
-                """INSERT INTO sale_mapping (raw_sale_id, main_sale_id)
-                   VALUES (%s, %s)""",
-                (raw_sale_id, main_sale_id)
+                """INSERT INTO id_sequence (table_name, next_id) VALUES (%s, LAST_INSERT_ID(%s) + %s)
+                   ON DUPLICATE KEY UPDATE next_id = LAST_INSERT_ID(GREATEST(next_id, %s)) + %s""",
+                (main_table, floor_id, count, floor_id, count)
             )
-
-        conn.commit()
-        return {"status": "success", "message": "Sales migrated & mapping updated"}
-
-    except Error as e:
+            cursor.execute("SELECT LAST_INSERT_ID()")
+            first = cursor.fetchone()[0]
+            conn.commit()
+        finally:
+            cursor.close()
+    return first
+
+def _mapped_batch(raw_table, main_table, mapping_table, key_column, columns, joins,
+                  batch_size, id_range=None):
+    """
+    Builds the batch function migrating raw rows entirely inside MySQL.
+
+    Foreign keys are resolved by joining the raw table (alias r) to the
+    mapping tables in joins. The batch is first staged in a temporary
+    table with its ROW_NUMBER() in raw id order; main ids are the start of
+    a block reserved with _reserve_ids() plus that number, and the main
+    rows and the mapping rows are both written with INSERT ... SELECT. Raw
+    rows that already have a mapping entry are excluded by an anti-join,
+    so each raw row is migrated once.
+
+    Args:
+        raw_table / main_table / mapping_table (str): Tables involved.
+        key_column (str): Primary key name of raw and main tables.
+        columns (dict): main column -> SQL expression over r and joins.
+        joins (str): JOIN clauses resolving the foreign keys; raw rows
+            without a mapping drop out here.
+        batch_size (int): Raw rows per batch.
+        id_range (tuple, optional): (first id, last id) of the raw rows
+            this shard migrates.
+    """
+    staging = f"tmp_{mapping_table}"
+    in_range = f"AND r.{key_column} <= {int(id_range[1])}" if id_range else ""
+
+    def process_batch(cursor, after_id):
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging}")
+        cursor.execute(
+            f"""CREATE TEMPORARY TABLE {staging} (
+                    raw_id INT PRIMARY KEY,
+                    seq INT NOT NULL
+                )"""
+        )
+        cursor.execute(
+            f"""INSERT INTO {staging} (raw_id, seq)
+                SELECT raw_id, ROW_NUMBER() OVER (ORDER BY raw_id)
+                FROM (
+                    SELECT r.{key_column} AS raw_id
+                    FROM {raw_table} r
+                    {joins}
+                    LEFT JOIN {mapping_table} done ON done.raw_{key_column} = r.{key_column}
+                    WHERE done.raw_{key_column} IS NULL AND r.{key_column} > %s {in_range}
+                    ORDER BY r.{key_column}
+                    LIMIT %s
+                ) batch""",
+            (after_id, batch_size)
+        )
+        migrated = cursor.rowcount
+        if migrated == 0:
+            cursor.execute(f"DROP TEMPORARY TABLE {staging}")
+            return None
+
+        base = _reserve_ids(main_table, mapping_table, key_column, migrated) - 1
+
+        cursor.execute(
+            f"""INSERT INTO {main_table} ({key_column}, {', '.join(columns)})
+                SELECT %s + t.seq, {', '.join(columns.values())}
+                FROM {staging} t
+                JOIN {raw_table} r ON r.{key_column} = t.raw_id
+                {joins}""",
+            (base,)
+        )
+        cursor.execute(
+            f"""INSERT INTO {mapping_table} (raw_{key_column}, main_{key_column})
+                SELECT raw_id, %s + seq FROM {staging}""",
+            (base,)
+        )
+        cursor.execute(f"SELECT MAX(raw_id) AS last_id FROM {staging}")
+        last_id = cursor.fetchone()["last_id"]
+        cursor.execute(f"DROP TEMPORARY TABLE {staging}")
+
+        return {"rows": migrated, "inserted": migrated, "last_id": last_id}
+
+    return process_batch
+
+@invalidates("orders", "order_mapping")
+def migrate_order(batch_size=BATCH_SIZE, resume=True, shards=1):
+    # Each raw order is migrated once (tracked in order_mapping); raw orders
+    # whose customer or product has no mapping yet are skipped
+    try:
+        stats = _run_sharded("orders_raw", "order_mapping", "order_id", lambda first, last: _mapped_batch(
+            "orders_raw", "orders", "order_mapping", "order_id",
+            {
+                "customer_id": "cm.main_customer_id",
+                "product_id": "pm.main_product_id",
+                "quantity": "r.quantity",
+                "order_status": "r.order_status",
+                "payment_method": "r.payment_method",
+            },
+            """JOIN customer_mapping cm ON cm.raw_customer_id = r.customer_id
+               JOIN product_mapping pm ON pm.raw_product_id = r.product_id""",
+            batch_size, (first, last)
+        ), resume, shards)
+        return {"status": "success", "message": "Orders migrated & mapping updated",
+                "migrated": stats["inserted"], "throughput": stats}
+
+    except (Error, ConnectionError) as e:
         return {"status": "error", "message": str(e)}
 
-    finally:
-        cursor.close()
-        conn.close()
-
-def migrate_all():
-    conn = create_connection()
-    cursor = conn.cursor(dictionary=True)
+@invalidates("sales", "sale_mapping")
+def migrate_sales(batch_size=BATCH_SIZE, resume=True, shards=1):
+    # Sales follow their order through order_mapping; sales whose order
+    # has not been migrated are skipped
+    try:
+        stats = _run_sharded("sales_raw", "sale_mapping", "sale_id", lambda first, last: _mapped_batch(
+            "sales_raw", "sales", "sale_mapping", "sale_id",
+            {
+                "order_id": "om.main_order_id",
+                "sale_amount": "r.sale_amount",
+                "profit": "r.profit",
+                "region": "r.region",
+            },
+            "JOIN order_mapping om ON om.raw_order_id = r.order_id",
+            batch_size, (first, last)
+        ), resume, shards)
+        return {"status": "success", "message": "Sales migrated & mapping updated",
+                "migrated": stats["inserted"], "throughput": stats}
+
+    except (Error, ConnectionError) as e:
+        return {"status": "error", "message": str(e)}
 
+def _as_stage(func, **kwargs):
+    # run_stages() only skips dependents of a stage that raised, so turn
+    # an error result into an exception
+    def run():
+        result = func(**kwargs)
+        if result["status"] == "error":
+            raise RuntimeError(result["message"])
+        return result
+    return run
+
+def migrate_all(max_workers=4, resume=True):
+    """
+    Migrates every raw table into the main tables.
+
+    Raw customers are first deduplicated (dedup_customers) so customer
+    migration can map duplicates to one main customer.
+
+    Stages run concurrently where the mapping tables allow it: customers
+    and products are independent, orders wait for both (they resolve
+    customer and product ids through customer_mapping and product_mapping)
+    and sales wait for orders. Orders and sales are additionally split
+    into max_workers id-range shards migrated in parallel. Stages with no
+    pending raw rows are skipped, and a failed stage skips the stages that
+    depend on it.
+
+    Returns:
+        dict: stage -> migration result (plus "seconds"), or
+              {"status": "error" | "skipped", ...}
+    """
     summary = {
+        "customer_dedup": None,
         "customer_migration": None,
         "product_migration": None,
         "order_migration": None,
         "sales_migration": None
     }
 
+    # stage -> (function, raw table, mapping table, key, stages it depends on)
+    stage_plan = {
+        "customer_dedup": (_as_stage(dedup_customers),
+                           "customers_raw", "customer_mapping", "customer_id", []),
+        "customer_migration": (_as_stage(migrate_customer, resume=resume),
+                               "customers_raw", "customer_mapping", "customer_id", ["customer_dedup"]),
+        "product_migration": (_as_stage(migrate_product, resume=resume),
+                              "products_raw", "product_mapping", "product_id", []),
+        "order_migration": (_as_stage(migrate_order, resume=resume, shards=max_workers),
+                            "orders_raw", "order_mapping", "order_id",
+                            ["customer_migration", "product_migration"]),
+        "sales_migration": (_as_stage(migrate_sales, resume=resume, shards=max_workers),
+                            "sales_raw", "sale_mapping", "sale_id", ["order_migration"]),
+    }
+
     try:
-        # -------------------------
-        # 1. CUSTOMERS
-        # -------------------------
-        cursor.execute("SELECT COUNT(*) AS cnt FROM customers_raw")
-        if cursor.fetchone()["cnt"] > 0:
-            summary["customer_migration"] = migrate_customer()
-        else:
-            summary["customer_migration"] = {"status": "skipped", "reason": "customers_raw is empty"}
-
-        # -------------------------
-        # 2. PRODUCTS
-        # -------------------------
-        cursor.execute("SELECT COUNT(*) AS cnt FROM products_raw")
-        if cursor.fetchone()["cnt"] > 0:
-            summary["product_migration"] = migrate_product()
-        else:
-            summary["product_migration"] = {"status": "skipped", "reason": "products_raw is empty"}
-
-        # -------------------------
-        # 3. ORDERS
-        # -------------------------
-        cursor.execute("SELECT COUNT(*) AS cnt FROM orders_raw")
-        if cursor.fetchone()["cnt"] > 0:
-            summary["order_migration"] = migrate_order()
-        else:
-            summary["order_migration"] = {"status": "skipped", "reason": "orders_raw is empty"}
-
-        # -------------------------
-        # 4. SALES
-        # -------------------------
-        cursor.execute("SELECT COUNT(*) AS cnt FROM sales_raw")
-        if cursor.fetchone()["cnt"] > 0:
-            summary["sales_migration"] = migrate_sales()
-        else:
-            summary["sales_migration"] = {"status": "skipped", "reason": "sales_raw is empty"}
+        # One round trip for the pending (not yet mapped) row counts
+        with get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT " + ", ".join(
+                f"""(SELECT COUNT(*) FROM {raw} r
+                     LEFT JOIN {mapping} done ON done.raw_{key} = r.{key}
+                     WHERE done.raw_{key} IS NULL) AS {name}"""
+                for name, (_, raw, mapping, key, _) in stage_plan.items()
+            ))
+            counts = cursor.fetchone()
+            cursor.close()
+
+        stages = {}
+        for name, (func, raw, _, _, deps) in stage_plan.items():
+            if counts[name] > 0:
+                stages[name] = (func, [dep for dep in deps if counts[dep] > 0])
+            else:
+                summary[name] = {"status": "skipped", "reason": f"{raw} has no rows to migrate"}
+
+        for name, outcome in run_stages(stages, max_workers).items():
+            if "error" in outcome:
+                summary[name] = {"status": "error", "message": outcome["error"],
+                                 "seconds": outcome["seconds"]}
+            else:
+                summary[name] = {**outcome["result"], "seconds": outcome["seconds"]}
 
         return summary
 
     except Exception as e:
         return {"status": "error", "message": str(e)}
-
-    finally:
-        cursor.close()
-        conn.close()
@@ -1,23 +1,102 @@
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, pooling
+from mysql.connector.errors import PoolError
+from contextlib import contextmanager
 from dotenv import load_dotenv
+import threading
+import time
 import os
 
 # Loading environment variables
 load_dotenv()
 
+# Process-wide pool settings (mysql-connector caps a pool at 32 connections)
+POOL_NAME = "datapulse_pool"
+POOL_SIZE = min(int(os.getenv("DB_POOL_SIZE", 10)), pooling.CNX_POOL_MAXSIZE)
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+
+# Lets bulk imports use LOAD DATA LOCAL INFILE (the server must also
+# have local_infile enabled)
+LOCAL_INFILE = os.getenv("DB_LOCAL_INFILE", "0") == "1"
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """Creates the shared connection pool on first use and returns it."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pooling.MySQLConnectionPool(
+                    pool_name=POOL_NAME,
+                    pool_size=POOL_SIZE,
+                    pool_reset_session=True,
+                    host=os.getenv("DB_HOST"),
+                    user=os.getenv("DB_USER"),
+                    password=os.getenv("DB_PASSWORD"),
+                    database=os.getenv("DB_NAME"),
+                    port=os.getenv("DB_PORT"),
+                    allow_local_infile=LOCAL_INFILE
+                )
+                print(f"Connected to DataPulse_db successfully! (pool size {POOL_SIZE})")
+    return _pool
+
+
 def create_connection():
+    """
+    Hands out a connection from the process-wide pool.
+
+    The pool pings each connection on checkout and reconnects it if the
+    server dropped it, so callers always get a live session. When every
+    connection is in use the call waits up to DB_POOL_TIMEOUT seconds for
+    one to be given back. Calling close() on the result returns it to the pool.
+
+    Returns:
+        PooledMySQLConnection, or None if no connection could be obtained.
+    """
+    deadline = time.monotonic() + POOL_TIMEOUT
+    while True:
+        try:
+            return _get_pool().get_connection()
+        except PoolError as e:
+            if time.monotonic() >= deadline:
+                print(f"Can't connect to DataPulse_db: {e}")
+                return None
+            time.sleep(0.05)
+        except Error as e:
+            print(f"Can't connect to DataPulse_db: {e}")
+            return None
+
+
+def release_connection(connection):
+    """Returns a pooled connection, ignoring errors from a dead session."""
+    if connection is None:
+        return
+    try:
+        connection.close()
+    except Error:
+        pass
+
+
+@contextmanager
+def get_connection():
+    """
+    Context manager around create_connection().
+
+    Usage:
+        with get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            ...
+
+    Raises:
+        ConnectionError: If the pool could not hand out a connection.
+    """
+    connection = create_connection()
+    if connection is None:
+        raise ConnectionError("Can't connect to DataPulse_db")
     try:
-        connection = mysql.connector.connect(
-            host=os.getenv("DB_HOST"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            database=os.getenv("DB_NAME"),
-            port=os.getenv("DB_PORT")
-        )
-        if connection.is_connected():
-            print("Connected to DataPulse_db successfully!")
-        return connection
-    except Error as e:
-        print(f"Can't connect to DataPulse_db: {e}")
-        return None
+        yield connection
+    finally:
+        release_connection(connection)
@@ -1,8 +1,11 @@
-from utils.database_connection import create_connection
+from utils.database_connection import create_connection, release_connection
+from utils.natural_key_index import get_index
+from utils.query_cache import invalidates
 from mysql.connector import Error
 
 #INSERT FUNCTIONS FOR RAW TABLES:
 
+@invalidates("customers_raw")
 def insert_raw_customer(customer_name, email, phone ,city):
     conn = create_connection()
     if not conn:
@@ -16,6 +19,7 @@ def insert_raw_customer(customer_name, email, phone ,city):
         values=(customer_name, email, phone, city)
         cursor.execute(query,values)
         conn.commit()
+        get_index("customers_raw").add(phone, cursor.lastrowid)
 
         print(f"Successfully inserted customer: {customer_name}")
         return True
@@ -23,11 +27,11 @@ def insert_raw_customer(customer_name, email, phone ,city):
         print(f"Error inserting data into customers_raw: {e}")
         return False
     finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
-            print("Connection closed.")
+        cursor.close()
+        release_connection(conn)
+        print("Connection closed.")
 
+@invalidates("products_raw")
 def insert_raw_product(product_name, category, selling_price, cost_price,stock):
     conn=create_connection()
     if not conn:
@@ -41,18 +45,19 @@ def insert_raw_product(product_name, category, selling_price, cost_price,stock):
         values=(product_name, category, selling_price, cost_price,stock)
         cursor.execute(query,values)
         conn.commit()
+        get_index("products_raw").add(product_name, cursor.lastrowid)
         print(f"Successfully inserted product: {product_name}")
         return True
     except Error as e:
         print(f"Error inserting data into products_raw: {e}")
         return False
     finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
-            print("Connection closed.")
+        cursor.close()
+        release_connection(conn)
+        print("Connection closed.")
 
 
+@invalidates("orders_raw")
 def insert_raw_order(customer_id, product_id, quantity, order_status, payment_method):
     conn=create_connection()
     if not conn:
@@ -72,11 +77,11 @@ def insert_raw_order(customer_id, product_id, quantity, order_status, payment_me
         print(f"Error inserting data into orders_raw: {e}")
         return False
     finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
-            print("Connection closed.")
+        cursor.close()
+        release_connection(conn)
+        print("Connection closed.")
     
+@invalidates("sales_raw")
 def insert_raw_sale(order_id, sale_amount, profit, region):
     conn=create_connection()
     if not conn:
@@ -96,14 +101,14 @@ def insert_raw_sale(order_id, sale_amount, profit, region):
         print(f"Error inserting data into sales_raw: {e}")
         return False
     finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
-            print("Connection closed.")
+        cursor.close()
+        release_connection(conn)
+        print("Connection closed.")
     
 
 #INSERT FUNCTIONS FOR MAIN TABLES:
 
+@invalidates("customers")
 def insert_customer(customer_id,customer_name, email, phone ,city,created_at):
     conn = create_connection()
     if not conn:
@@ -124,11 +129,11 @@ def insert_customer(customer_id,customer_name, email, phone ,city,created_at):
         print(f"Error inserting data into customers: {e}")
         return False
     finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
-            print("Connection closed.")
+        cursor.close()
+        release_connection(conn)
+        print("Connection closed.")
 
+@invalidates("products")
 def insert_product(product_id,product_name, category, selling_price, cost_price,stock,added_at):
     conn=create_connection()
     if not conn:
@@ -148,11 +153,11 @@ def insert_product(product_id,product_name, category, selling_price, cost_price,
         print(f"Error inserting data into products: {e}")
         return False
     finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
-            print("Connection closed.")
+        cursor.close()
+        release_connection(conn)
+        print("Connection closed.")
 
+@invalidates("orders")
 def insert_order(order_id,customer_id, product_id, quantity, order_status, payment_method,order_date):
     conn=create_connection()
     if not conn:
@@ -172,11 +177,11 @@ def insert_order(order_id,customer_id, product_id, quantity, order_status, payme
         print(f"Error inserting data into orders: {e}")
         return False
     finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
-            print("Connection closed.")
+        cursor.close()
+        release_connection(conn)
+        print("Connection closed.")
 
+@invalidates("sales")
 def insert_sale(sale_id,order_id, sale_amount, profit, region,sale_date):
     conn=create_connection()
     if not conn:
@@ -196,8 +201,7 @@ def insert_sale(sale_id,order_id, sale_amount, profit, region,sale_date):
         print(f"Error inserting data into sales: {e}")
         return False
     finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
-            print("Connection closed.")
+        cursor.close()
+        release_connection(conn)
+        print("Connection closed.")
     
\ No newline at end of file
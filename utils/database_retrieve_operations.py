@@ -1,36 +1,215 @@
-from utils.database_connection import create_connection
+from utils.database_connection import create_connection, get_connection
+from utils.query_cache import cached_read, cached_query, cached_call
+from utils.columnar_fetch import read_frame
 from mysql.connector import Error
 
-def retrieve_table(table_name):
+# Default rows per page for retrieve_page()
+PAGE_SIZE = 100
+
+# Comparison operators accepted in retrieve_page() filters
+FILTER_OPERATORS = {"=", "!=", "<", "<=", ">", ">=", "LIKE"}
+
+# table -> (columns in table order, primary key); schemas do not change at runtime
+_table_schemas = {}
+
+def get_table_schema(table_name):
+    """
+    Returns the columns and primary key of a table in DataPulse_db.
+
+    Read once per table from information_schema and kept for the life of
+    the process. Also validates table_name, since identifiers cannot be
+    passed as query parameters.
+
+    Returns:
+        tuple: (list of column names, primary key column or None)
+
+    Raises:
+        ValueError: If the table does not exist.
+    """
+    if table_name not in _table_schemas:
+        with get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(
+                """SELECT COLUMN_NAME AS name, COLUMN_KEY AS col_key
+                   FROM information_schema.COLUMNS
+                   WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+                   ORDER BY ORDINAL_POSITION""",
+                (table_name,)
+            )
+            rows = cursor.fetchall()
+            cursor.close()
+        if not rows:
+            raise ValueError(f"Unknown table '{table_name}'")
+        primary_key = next((r["name"] for r in rows if r["col_key"] == "PRI"), None)
+        _table_schemas[table_name] = ([r["name"] for r in rows], primary_key)
+    return _table_schemas[table_name]
+
+def _check_columns(table_name, columns):
+    known, _ = get_table_schema(table_name)
+    unknown = [c for c in columns if c not in known]
+    if unknown:
+        raise ValueError(f"Unknown column(s) for {table_name}: {', '.join(unknown)}")
+
+def _filter_clause(table_name, filters):
+    """
+    Builds a WHERE clause from filters.
+
+    Args:
+        filters (dict): column -> value (equality) or (operator, value),
+            operator being one of FILTER_OPERATORS.
+
+    Returns:
+        tuple: (where, params)
     """
-    Fetches all rows from a given table in DataPulse_db.
+    conditions = []
+    params = []
+    for column, condition in (filters or {}).items():
+        _check_columns(table_name, [column])
+        operator, value = condition if isinstance(condition, tuple) else ("=", condition)
+        if operator not in FILTER_OPERATORS:
+            raise ValueError(f"Unsupported filter operator '{operator}'")
+        if value is None:
+            conditions.append(f"`{column}` IS {'NOT ' if operator == '!=' else ''}NULL")
+        else:
+            conditions.append(f"`{column}` {operator} %s")
+            params.append(value)
+    return " AND ".join(conditions) or "TRUE", params
+
+def retrieve_table(table_name, columns=None, filters=None, limit=None, as_frame=False):
+    """
+    Fetches rows from a given table in DataPulse_db.
     
     Args:
         table_name (str): Name of the table to fetch data from.
+        columns (list of str, optional): Columns to return (default all).
+        filters (dict, optional): Server-side filters, see retrieve_page().
+        limit (int, optional): Maximum number of rows.
+        as_frame (bool): Return a DataFrame decoded column by column
+            (see utils/columnar_fetch.py) instead of a list of dicts;
+            use it whenever the rows end up in pandas. Dicts stay the
+            default for callers that use rows as records.
     
+    Results come from the shared result cache (utils/query_cache.py)
+    until the table is written or the entry expires; do not modify them.
+
     Returns:
         list of dict: Rows from the table as dictionaries.
+        pd.DataFrame: The rows, if as_frame is set.
         False if there is an error or connection issue.
     """
-    conn = create_connection()
-    if not conn:
-        print("Can't connect to the database!!")
-        return False
-    cursor = conn.cursor(dictionary=True)  # fetch rows as dicts
     try:
-        query = f"SELECT * FROM {table_name}"
-        cursor.execute(query)
-        data = cursor.fetchall()
+        _check_columns(table_name, columns or [])
+        where, params = _filter_clause(table_name, filters)
+        select_cols = ", ".join(f"`{c}`" for c in columns) if columns else "*"
+        query = f"SELECT {select_cols} FROM {table_name} WHERE {where}"
+        if limit is not None:
+            query += " LIMIT %s"
+            params.append(int(limit))
+        if as_frame:
+            data = cached_call([table_name], read_frame, query, tuple(params))
+        else:
+            data = cached_query(query, params, tables=[table_name])
         print(f"Fetched data from {table_name} table!!")
         return data
-    except Error as e:
+    except (Error, ConnectionError, ValueError) as e:
         print(f"Error fetching data from {table_name}: {e}")
         return False
-    finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
-            print("Connection closed.")
+
+def retrieve_page(table_name, columns=None, filters=None, sort_by=None, descending=False,
+                  page_size=PAGE_SIZE, after=None):
+    """
+    Fetches one page of a table using keyset pagination.
+
+    Pages are ordered by sort_by (if given) and then by the primary key,
+    and each page continues from the last row of the previous one
+    (WHERE (sort, key) > cursor) instead of using OFFSET, so every page
+    costs one index range scan no matter how deep it is. NULL sort_by
+    values follow MySQL's ordering (first ascending, last descending);
+    the cursor condition has explicit IS NULL branches for them, so pages
+    continue correctly across rows with NULLs.
+
+    Args:
+        table_name (str): Table to read.
+        columns (list of str, optional): Columns to return (default all);
+            the sort and key columns are always fetched.
+        filters (dict, optional): column -> value, or (operator, value)
+            with operator in FILTER_OPERATORS; applied server-side.
+        sort_by (str, optional): Column to sort by.
+        descending (bool): Sort direction.
+        page_size (int): Rows per page.
+        after (tuple, optional): next_cursor of the previous page.
+
+    Returns:
+        dict: {"rows": list of dict, "next_cursor": tuple or None,
+               "has_more": bool}
+
+    Raises:
+        ValueError: For unknown tables, columns or operators, or a table
+            without a primary key.
+    """
+    all_columns, key_column = get_table_schema(table_name)
+    if key_column is None:
+        raise ValueError(f"{table_name} has no primary key to paginate on")
+    columns = list(columns or all_columns)
+    _check_columns(table_name, columns + ([sort_by] if sort_by else []))
+
+    order_columns = [sort_by, key_column] if sort_by and sort_by != key_column else [key_column]
+    select_columns = columns + [c for c in order_columns if c not in columns]
+
+    where, params = _filter_clause(table_name, filters)
+    if after is not None:
+        op = "<" if descending else ">"
+        if len(order_columns) == 2 and after[0] is None:
+            # MySQL sorts NULLs first ascending and last descending
+            nulls_done = f"`{sort_by}` IS NOT NULL OR " if not descending else ""
+            where += f" AND ({nulls_done}(`{sort_by}` IS NULL AND `{key_column}` {op} %s))"
+            params.append(after[1])
+        elif len(order_columns) == 2:
+            nulls_left = f" OR `{sort_by}` IS NULL" if descending else ""
+            where += (f" AND (`{sort_by}` {op} %s OR (`{sort_by}` = %s AND `{key_column}` {op} %s)"
+                      f"{nulls_left})")
+            params += [after[0], after[0], after[1]]
+        else:
+            where += f" AND `{key_column}` {op} %s"
+            params.append(after[-1])
+
+    direction = "DESC" if descending else "ASC"
+    query = (
+        f"SELECT {', '.join(f'`{c}`' for c in select_columns)} FROM {table_name} "
+        f"WHERE {where} "
+        f"ORDER BY {', '.join(f'`{c}` {direction}' for c in order_columns)} "
+        f"LIMIT %s"
+    )
+    # One extra row tells whether another page exists
+    params.append(int(page_size) + 1)
+
+    rows = cached_query(query, params, tables=[table_name])
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    next_cursor = tuple(rows[-1][c] for c in order_columns) if has_more else None
+    return {
+        "rows": [{c: row[c] for c in columns} for row in rows],
+        "next_cursor": next_cursor,
+        "has_more": has_more,
+    }
+
+def estimate_row_count(table_name):
+    """
+    Approximate number of rows in a table, from InnoDB statistics.
+
+    Costs one information_schema lookup instead of a COUNT(*) scan; the
+    value can be off by a few percent on large tables.
+    """
+    get_table_schema(table_name)
+    rows = cached_query(
+        """SELECT TABLE_ROWS AS estimate FROM information_schema.TABLES
+           WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s""",
+        (table_name,), tables=[table_name]
+    )
+    return int(rows[0]["estimate"] or 0) if rows else 0
+
+@cached_read("customers_raw", "customers")
 def retrieve_all_customers():
     conn = create_connection()
     cursor = conn.cursor(dictionary=True)
@@ -43,11 +222,13 @@ def retrieve_all_customers():
         """
         cursor.execute(query)
         return cursor.fetchall()
-    except:
-        return []
+    except (Error, ConnectionError):
+        # None, not [], so cached_call does not keep the failure as "no rows"
+        return None
     finally:
         cursor.close()
         conn.close()
+@cached_read("products_raw", "products")
 def retrieve_all_products():
     conn = create_connection()
     cursor = conn.cursor(dictionary=True)
@@ -79,14 +260,15 @@ def retrieve_all_products():
         cursor.execute(query)
         return cursor.fetchall()
 
-    except Exception as e:
+    except (Error, ConnectionError) as e:
         print("Error in retrieve_all_products:", e)
-        return []
+        return None
 
     finally:
         cursor.close()
         conn.close()
 
+@cached_read("orders_raw", "orders")
 def retrieve_all_orders():
     conn = create_connection()
     cursor = conn.cursor(dictionary=True)
@@ -101,8 +283,9 @@ def retrieve_all_orders():
         """
         cursor.execute(query)
         return cursor.fetchall()
-    except:
-        return []
+    except (Error, ConnectionError):
+        # None, not [], so cached_call does not keep the failure as "no rows"
+        return None
     finally:
         cursor.close()
         conn.close()
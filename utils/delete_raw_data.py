@@ -1,220 +1,155 @@
-from utils.database_connection import create_connection
+from utils.database_connection import get_connection
+from utils.batch_operations import CHUNK_SIZE
+from utils.natural_key_index import invalidate_index
+from utils.raw_archive import archive_raw_table
+from utils.query_cache import invalidates
 from mysql.connector import Error
-import pandas as pd
 
-def del_customer():
-    conn = create_connection()
-    cursor = conn.cursor(dictionary=True)
+# Number of not-migrated ids listed in a report (the count is always exact)
+REPORT_SAMPLE = 100
 
-    not_migrated_ids = [] 
-    deleted_count = 0
-
-    try:
-        # Raw table guaranteed to have data (checked by master function)
-        cursor.execute("SELECT customer_id FROM customers_raw")
-        customer_raw = pd.DataFrame(cursor.fetchall())
-
-        # Load mapping table
-        cursor.execute("SELECT raw_customer_id FROM customer_mapping")
-        cust_mapping = pd.DataFrame(cursor.fetchall())
-
-        migrated_raw_ids = set(cust_mapping['raw_customer_id']) if not cust_mapping.empty else set()
-
-        # Determine IDs to delete: intersection of raw table and migrated IDs
-        ids_to_delete = migrated_raw_ids.intersection(set(customer_raw['customer_id']))
-
-        # Not migrated IDs for reporting
-        not_migrated_ids = [rid for rid in customer_raw['customer_id'] if rid not in migrated_raw_ids]
-
-        if ids_to_delete:
-            # Bulk delete using IN clause
-            format_strings = ','.join(['%s'] * len(ids_to_delete))
-            query = f"DELETE FROM customers_raw WHERE customer_id IN ({format_strings})"
-            cursor.execute(query, tuple(ids_to_delete))
-            deleted_count = cursor.rowcount
-
-        conn.commit()
-
-        return {
-            "status": "success",
-            "deleted_count": deleted_count,
-            "not_migrated_count": len(not_migrated_ids),
-            "not_migrated_ids": not_migrated_ids
-        }
-
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
-
-    finally:
-        cursor.close()
-        conn.close()
-
-def del_product():
-    conn = create_connection()
-    cursor = conn.cursor(dictionary=True)
-
-    not_migrated_ids = []
-    deleted_count = 0
-
-    try:
-        # Raw table guaranteed to have data (checked by master function)
-        cursor.execute("SELECT product_id FROM products_raw")
-        product_raw = pd.DataFrame(cursor.fetchall())
-
-        # Loading mapping table
-        cursor.execute("SELECT raw_product_id FROM product_mapping")
-        prod_mapping = pd.DataFrame(cursor.fetchall())
-
-        migrated_raw_ids = set(prod_mapping['raw_product_id']) if not prod_mapping.empty else set()
-
-        # Determine product_ids to delete
-        raw_ids = set(product_raw['product_id'])
-        ids_to_delete = migrated_raw_ids.intersection(raw_ids)
-
-        # Not migrated
-        not_migrated_ids = list(raw_ids - migrated_raw_ids)
-
-        # Bulk delete
-        if ids_to_delete:
-            format_strings = ','.join(['%s'] * len(ids_to_delete))
-            query = f"DELETE FROM products_raw WHERE product_id IN ({format_strings})"
-            cursor.execute(query, tuple(ids_to_delete))
-            deleted_count = cursor.rowcount
-
-        conn.commit()
-
-        return {
-            "status": "success",
-            "deleted_count": deleted_count,
-            "not_migrated_count": len(not_migrated_ids),
-            "not_migrated_ids": not_migrated_ids
-        }
 
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
+def _delete_migrated(raw_table, mapping_table, key_column, chunk_size=CHUNK_SIZE):
+    """
+    Deletes the raw rows that have been migrated, i.e. have a mapping entry.
 
-    finally:
-        cursor.close()
-        conn.close()
+    The delete runs server-side as DELETE ... JOIN against the mapping
+    table, one primary-key range of chunk_size ids at a time with a commit
+    per chunk, so no id list is sent to the server and locks are held on
+    one chunk only. Rows not migrated yet are counted with an anti-join.
 
-def del_order():
-    conn = create_connection()
-    cursor = conn.cursor(dictionary=True)
+    Args:
+        raw_table (str): Raw table to clean up.
+        mapping_table (str): Its mapping table (raw_<key> column).
+        key_column (str): Primary key of the raw table.
+        chunk_size (int): Width of the id range deleted per transaction.
 
-    not_migrated_ids = []
+    Returns:
+        dict: {"status", "deleted_count", "not_migrated_count",
+               "not_migrated_ids" (first REPORT_SAMPLE ids), "chunks"}
+    """
     deleted_count = 0
+    chunks = 0
 
     try:
-        cursor.execute("SELECT order_id FROM orders_raw")
-        order_raw = pd.DataFrame(cursor.fetchall())
-
-        cursor.execute("SELECT raw_order_id FROM order_mapping")
-        order_mapping = pd.DataFrame(cursor.fetchall())
-
-        migrated_raw_ids = set(order_mapping['raw_order_id']) if not order_mapping.empty else set()
-
-        raw_ids = set(order_raw['order_id'])
-        ids_to_delete = migrated_raw_ids.intersection(raw_ids)
-
-        not_migrated_ids = list(raw_ids - migrated_raw_ids)
-
-        if ids_to_delete:
-            format_strings = ",".join(["%s"] * len(ids_to_delete))
-            query = f"DELETE FROM orders_raw WHERE order_id IN ({format_strings})"
-            cursor.execute(query, tuple(ids_to_delete))
-            deleted_count = cursor.rowcount
-
-        conn.commit()
+        with get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                cursor.execute(f"SELECT MIN({key_column}) AS lo, MAX({key_column}) AS hi FROM {raw_table}")
+                bounds = cursor.fetchone()
+
+                if bounds["lo"] is not None:
+                    for start in range(bounds["lo"], bounds["hi"] + 1, chunk_size):
+                        cursor.execute(
+                            f"""DELETE r FROM {raw_table} r
+                                JOIN {mapping_table} m ON m.raw_{key_column} = r.{key_column}
+                                WHERE r.{key_column} BETWEEN %s AND %s""",
+                            (start, start + chunk_size - 1)
+                        )
+                        deleted_count += cursor.rowcount
+                        chunks += 1
+                        conn.commit()
+
+                not_migrated = (
+                    f"""FROM {raw_table} r
+                        LEFT JOIN {mapping_table} m ON m.raw_{key_column} = r.{key_column}
+                        WHERE m.raw_{key_column} IS NULL"""
+                )
+                cursor.execute(f"SELECT COUNT(*) AS cnt {not_migrated}")
+                not_migrated_count = cursor.fetchone()["cnt"]
+                cursor.execute(
+                    f"SELECT r.{key_column} {not_migrated} ORDER BY r.{key_column} LIMIT %s",
+                    (REPORT_SAMPLE,)
+                )
+                not_migrated_ids = [row[key_column] for row in cursor.fetchall()]
+            finally:
+                cursor.close()
 
         return {
             "status": "success",
             "deleted_count": deleted_count,
-            "not_migrated_count": len(not_migrated_ids),
-            "not_migrated_ids": not_migrated_ids
+            "not_migrated_count": not_migrated_count,
+            "not_migrated_ids": not_migrated_ids,
+            "chunks": chunks
         }
 
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
-
-    finally:
-        cursor.close()
-        conn.close()
+    except (Error, ConnectionError) as e:
+        # Chunks committed before the error stay deleted
+        return {"status": "error", "message": str(e), "deleted_count": deleted_count}
 
-def del_sale():
-    conn = create_connection()
-    cursor = conn.cursor(dictionary=True)
 
-    not_migrated_ids = []
-    deleted_count = 0
+@invalidates("customers_raw")
+def del_customer(chunk_size=CHUNK_SIZE):
+    result = _delete_migrated("customers_raw", "customer_mapping", "customer_id", chunk_size)
+    if result["deleted_count"]:
+        invalidate_index("customers_raw")
+    return result
 
-    try:
-        cursor.execute("SELECT sale_id FROM sales_raw")
-        sales_raw = pd.DataFrame(cursor.fetchall())
+@invalidates("products_raw")
+def del_product(chunk_size=CHUNK_SIZE):
+    result = _delete_migrated("products_raw", "product_mapping", "product_id", chunk_size)
+    if result["deleted_count"]:
+        invalidate_index("products_raw")
+    return result
 
-        cursor.execute("SELECT raw_sale_id FROM sale_mapping")
-        sale_mapping = pd.DataFrame(cursor.fetchall())
+@invalidates("orders_raw")
+def del_order(chunk_size=CHUNK_SIZE):
+    return _delete_migrated("orders_raw", "order_mapping", "order_id", chunk_size)
 
-        migrated_raw_ids = set(sale_mapping['raw_sale_id']) if not sale_mapping.empty else set()
-
-        raw_ids = set(sales_raw['sale_id'])
-        ids_to_delete = migrated_raw_ids.intersection(raw_ids)
-
-        not_migrated_ids = list(raw_ids - migrated_raw_ids)
-
-        if ids_to_delete:
-            format_strings = ",".join(["%s"] * len(ids_to_delete))
-            query = f"DELETE FROM sales_raw WHERE sale_id IN ({format_strings})"
-            cursor.execute(query, tuple(ids_to_delete))
-            deleted_count = cursor.rowcount
-
-        conn.commit()
-
-        return {
-            "status": "success",
-            "deleted_count": deleted_count,
-            "not_migrated_count": len(not_migrated_ids),
-            "not_migrated_ids": not_migrated_ids
-        }
-
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
-
-    finally:
-        cursor.close()
-        conn.close()
-    
-def delete_all_raw():
-    conn = create_connection()
-    cursor = conn.cursor(dictionary=True)
+@invalidates("sales_raw")
+def del_sale(chunk_size=CHUNK_SIZE):
+    return _delete_migrated("sales_raw", "sale_mapping", "sale_id", chunk_size)
 
+def delete_all_raw(chunk_size=CHUNK_SIZE, archive=None):
+    # archive="table" or "parquet" moves migrated rows to the archive tier
+    # (see utils/raw_archive.py) instead of dropping them
     results = {}
+    if archive:
+        del_customer_rows = lambda: archive_raw_table("customers_raw", archive, chunk_size)
+        del_product_rows = lambda: archive_raw_table("products_raw", archive, chunk_size)
+        del_order_rows = lambda: archive_raw_table("orders_raw", archive, chunk_size)
+        del_sale_rows = lambda: archive_raw_table("sales_raw", archive, chunk_size)
+    else:
+        del_customer_rows = lambda: del_customer(chunk_size)
+        del_product_rows = lambda: del_product(chunk_size)
+        del_order_rows = lambda: del_order(chunk_size)
+        del_sale_rows = lambda: del_sale(chunk_size)
 
     try:
+        # One round trip for all row counts
+        with get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("""
+                SELECT
+                    (SELECT COUNT(*) FROM customers_raw) AS customer,
+                    (SELECT COUNT(*) FROM products_raw) AS product,
+                    (SELECT COUNT(*) FROM orders_raw) AS orders,
+                    (SELECT COUNT(*) FROM sales_raw) AS sale
+            """)
+            counts = cursor.fetchone()
+            cursor.close()
+
         # CUSTOMER RAW
-        cursor.execute("SELECT COUNT(*) AS cnt FROM customers_raw")
-        if cursor.fetchone()['cnt'] > 0:
-            results['customer'] = del_customer()
+        if counts['customer'] > 0:
+            results['customer'] = del_customer_rows()
         else:
             results['customer'] = {"status": "skipped", "reason": "customers_raw empty"}
 
         # PRODUCT RAW
-        cursor.execute("SELECT COUNT(*) AS cnt FROM products_raw")
-        if cursor.fetchone()['cnt'] > 0:
-            results['product'] = del_product()
+        if counts['product'] > 0:
+            results['product'] = del_product_rows()
         else:
             results['product'] = {"status": "skipped", "reason": "products_raw empty"}
 
         # ORDER RAW
-        cursor.execute("SELECT COUNT(*) AS cnt FROM orders_raw")
-        if cursor.fetchone()['cnt'] > 0:
-            results['order'] = del_order()
+        if counts['orders'] > 0:
+            results['order'] = del_order_rows()
         else:
             results['order'] = {"status": "skipped", "reason": "orders_raw empty"}
 
         # SALES RAW
-        cursor.execute("SELECT COUNT(*) AS cnt FROM sales_raw")
-        if cursor.fetchone()['cnt'] > 0:
-            results['sale'] = del_sale()
+        if counts['sale'] > 0:
+            results['sale'] = del_sale_rows()
         else:
             results['sale'] = {"status": "skipped", "reason": "sales_raw empty"}
 
@@ -222,7 +157,3 @@ def delete_all_raw():
 
     except Exception as e:
         return {"status": "error", "message": str(e)}
-
-    finally:
-        cursor.close()
-        conn.close()
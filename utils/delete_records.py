@@ -1,51 +1,192 @@
-from utils.database_connection import create_connection
+"""
+Batch-mode bulk delete for the raw tables.
 
-def delete_rows_from_table(table_name, condition=None):
+Examples:
+    python -m utils.delete_records orders_raw --date-to 2024-01-01 --dry-run
+    python -m utils.delete_records sales_raw --id-from 1 --id-to 50000 \\
+        --rows-per-txn 2000 --pause 0.2
+    python -m utils.delete_records customers_raw --all
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+from mysql.connector import Error
+from utils.database_connection import get_connection
+from utils.batch_operations import BATCH_SIZE
+from utils.natural_key_index import invalidate_index
+from utils.query_cache import bump_tables
+
+# table -> (primary key, date column)
+TABLES = {
+    "customers_raw": ("customer_id", "created_at"),
+    "products_raw": ("product_id", "added_at"),
+    "orders_raw": ("order_id", "order_date"),
+    "sales_raw": ("sale_id", "sale_date"),
+}
+
+
+def build_filter(table_name, id_from=None, id_to=None, date_from=None, date_to=None):
+    """
+    Builds the WHERE clause for a bulk delete from structured filters.
+
+    Ids are inclusive; dates select date_from <= date < date_to on the
+    table's date column (created_at, added_at, order_date or sale_date).
+
+    Returns:
+        tuple: (where, params)
+    """
+    key_column, date_column = TABLES[table_name]
+    conditions = []
+    params = []
+    if id_from is not None:
+        conditions.append(f"{key_column} >= %s")
+        params.append(id_from)
+    if id_to is not None:
+        conditions.append(f"{key_column} <= %s")
+        params.append(id_to)
+    if date_from is not None:
+        conditions.append(f"{date_column} >= %s")
+        params.append(date_from)
+    if date_to is not None:
+        conditions.append(f"{date_column} < %s")
+        params.append(date_to)
+    return " AND ".join(conditions) or "TRUE", params
+
+
+def estimate_rows(table_name, where, params, exact=False):
+    """
+    Number of rows a delete would remove.
+
+    By default the optimizer's estimate from EXPLAIN (no table scan);
+    exact=True runs COUNT(*).
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            if exact:
+                cursor.execute(f"SELECT COUNT(*) AS cnt FROM {table_name} WHERE {where}", params)
+                return cursor.fetchone()["cnt"]
+            cursor.execute(f"EXPLAIN SELECT * FROM {table_name} WHERE {where}", params)
+            plan = cursor.fetchone()
+            # rows is NULL when the optimizer sees the WHERE can match
+            # nothing (e.g. --id-from above --id-to)
+            if not plan or plan["rows"] is None:
+                return 0
+            return int(plan["rows"] * (plan.get("filtered") or 100) / 100)
+        finally:
+            cursor.close()
+
+
+def delete_in_chunks(table_name, where, params, rows_per_txn=BATCH_SIZE, pause=0.0):
     """
-    Delete rows from a specified table based on an optional condition.
-    If no condition is provided, all rows are deleted (use with caution).
+    Deletes the rows matching where, rows_per_txn rows per transaction.
+
+    Each chunk selects the next rows_per_txn matching ids in key order
+    (keyset, so the scan never restarts) and deletes them by id, then
+    commits and sleeps pause seconds to leave room for other traffic.
+
+    Returns:
+        dict: {"status", "deleted", "chunks", "seconds", "rows_per_sec"}
+              or an error dict with the rows deleted before the error.
     """
-    conn = create_connection()
-    if not conn:
-        print("Database connection failed!")
-        return
-    
-    cursor = conn.cursor()
+    key_column = TABLES[table_name][0]
+    deleted = 0
+    chunks = 0
+    last_id = -1
+    start = time.perf_counter()
+
     try:
-        if condition:
-            query = f"DELETE FROM {table_name} WHERE {condition}"
-        else:
-            query = f"DELETE FROM {table_name}"  # Delete all rows
-
-        print(f"WARNING: You are about to run:\n{query}")
-        confirm = input("Type 'yes' to confirm: ").strip().lower()
-        if confirm != 'yes':
-            print("Operation cancelled.")
-            return
-        
-        cursor.execute(query)
-        conn.commit()
-        print(f"Successfully deleted rows from {table_name}.")
-    except Exception as e:
-        print(f"Error during delete operation: {e}")
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                while True:
+                    cursor.execute(
+                        f"""SELECT {key_column} FROM {table_name}
+                            WHERE ({where}) AND {key_column} > %s
+                            ORDER BY {key_column} LIMIT %s""",
+                        (*params, last_id, rows_per_txn)
+                    )
+                    ids = [row[0] for row in cursor.fetchall()]
+                    if not ids:
+                        break
+                    cursor.execute(
+                        f"DELETE FROM {table_name} WHERE {key_column} IN ({', '.join(['%s'] * len(ids))})",
+                        ids
+                    )
+                    conn.commit()
+                    deleted += cursor.rowcount
+                    chunks += 1
+                    last_id = ids[-1]
+                    if len(ids) < rows_per_txn:
+                        break
+                    if pause:
+                        time.sleep(pause)
+            finally:
+                cursor.close()
+        status = {"status": "success"}
+
+    except (Error, ConnectionError) as e:
+        # Chunks committed before the error stay deleted
+        status = {"status": "error", "message": str(e)}
+
     finally:
-        cursor.close()
-        conn.close()
-        print("Database connection closed.")
+        if deleted:
+            bump_tables(table_name)
+            if table_name in ("customers_raw", "products_raw"):
+                invalidate_index(table_name)
+
+    seconds = time.perf_counter() - start
+    return {
+        **status,
+        "deleted": deleted,
+        "chunks": chunks,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(deleted / seconds, 1) if seconds > 0 else 0.0,
+    }
+
+
+def _parse_date(value):
+    return datetime.fromisoformat(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk delete rows from a raw table in chunks.")
+    parser.add_argument("table", choices=list(TABLES))
+    parser.add_argument("--id-from", type=int, help="Smallest id to delete (inclusive)")
+    parser.add_argument("--id-to", type=int, help="Largest id to delete (inclusive)")
+    parser.add_argument("--date-from", type=_parse_date,
+                        help="Delete rows dated on/after this (YYYY-MM-DD[ HH:MM:SS])")
+    parser.add_argument("--date-to", type=_parse_date, help="Delete rows dated before this")
+    parser.add_argument("--all", action="store_true", help="Delete every row (no filter given)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report how many rows would be deleted")
+    parser.add_argument("--exact", action="store_true", help="Dry run counts rows instead of estimating")
+    parser.add_argument("--rows-per-txn", type=int, default=BATCH_SIZE, help="Rows deleted per transaction")
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between chunks")
+    args = parser.parse_args(argv)
+
+    where, params = build_filter(args.table, args.id_from, args.id_to, args.date_from, args.date_to)
+    if not params and not args.all:
+        parser.error("give at least one filter, or --all to delete every row")
+    if args.rows_per_txn <= 0:
+        parser.error("--rows-per-txn must be positive")
+
+    if args.dry_run:
+        rows = estimate_rows(args.table, where, params, args.exact)
+        kind = "exactly" if args.exact else "an estimated"
+        print(f"Dry run: {kind} {rows} row(s) of {args.table} match WHERE {where} {tuple(params)}")
+        return 0
+
+    print(f"Deleting from {args.table} WHERE {where} {tuple(params)}, "
+          f"{args.rows_per_txn} rows per transaction, {args.pause}s pause")
+    result = delete_in_chunks(args.table, where, params, args.rows_per_txn, args.pause)
+    print(f"Deleted {result['deleted']} row(s) in {result['chunks']} chunk(s), "
+          f"{result['seconds']}s ({result['rows_per_sec']} rows/sec)")
+    if result["status"] == "error":
+        print(f"Stopped by error: {result['message']}")
+        return 1
+    return 0
+
 
 if __name__ == "__main__":
-    tables = ["customers_raw", "products_raw", "orders_raw", "sales_raw"]
-    print("Tables:", tables)
-    table_name = input("Enter table name to delete from: ").strip()
-    if table_name not in tables:
-        print("Invalid table name.")
-    else:
-        choice = input("Delete (1) all rows or (2) by condition? Enter 1 or 2: ").strip()
-        condition = None
-        if choice == '2':
-            condition = input("Enter SQL WHERE condition (e.g. customer_id = 5): ").strip()
-            if not condition:
-                print("No condition entered, cancelling delete.")
-                exit()
-
-        delete_rows_from_table(table_name, condition)
+    sys.exit(main())
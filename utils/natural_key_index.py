@@ -0,0 +1,239 @@
+from dotenv import load_dotenv
+from utils.database_connection import get_connection
+from utils.batch_operations import CHUNK_SIZE, fetch_in_chunks
+import hashlib
+import math
+import os
+import threading
+import time
+import unicodedata
+
+# Loading environment variables
+load_dotenv()
+
+# Keep only a Bloom filter in memory instead of the full key -> id map
+KEY_INDEX_BLOOM = os.getenv("KEY_INDEX_BLOOM", "0") == "1"
+
+# Seconds between automatic incremental refreshes on lookup
+KEY_INDEX_MAX_AGE = float(os.getenv("KEY_INDEX_MAX_AGE", 5))
+
+
+def normalize_key(value):
+    """
+    Comparison form of a key value: trimmed, without accents, casefolded.
+
+    Approximates MySQL's default utf8mb4_0900_ai_ci collation (case- and
+    accent-insensitive) on trimmed values, so "Café" and " cafe" are the
+    same key. Code that compares keys in SQL must TRIM() them as well, as
+    data_migration does when it maps raw rows to main rows.
+    """
+    if value is None:
+        return None
+    decomposed = unicodedata.normalize("NFKD", str(value).strip())
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings.
+
+    Answers "definitely absent" or "possibly present"; the false positive
+    rate stays near error_rate until more than capacity items are added.
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.01):
+        capacity = max(int(capacity), 1)
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        # Double hashing: position_i = h1 + i * h2
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class NaturalKeyIndex:
+    """
+    In-process index of a table's natural key (e.g. phone) to its id.
+
+    Loaded once, then refreshed incrementally: only rows with an id above
+    the highest id already indexed are read, so keeping it current is one
+    index range scan. Writes that change or remove existing keys call
+    invalidate() and the next lookup reloads the index.
+
+    With bloom=True only a Bloom filter is kept in memory: a miss is
+    answered without touching the database, a hit is confirmed with one
+    indexed query. The database constraints stay authoritative; the index
+    only saves round trips.
+    """
+
+    def __init__(self, table_name, key_column, natural_key, bloom=KEY_INDEX_BLOOM,
+                 max_age=KEY_INDEX_MAX_AGE):
+        self.table_name = table_name
+        self.key_column = key_column
+        self.natural_key = natural_key
+        self.bloom = bloom
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._ids = {}
+        self._filter = None
+        self._last_id = -1
+        self._refreshed_at = None
+
+    def invalidate(self):
+        """Drops the index; the next lookup reloads it."""
+        with self._lock:
+            self._reset()
+
+    def refresh(self, cursor=None):
+        """
+        Adds rows inserted since the last refresh.
+
+        Args:
+            cursor: Optional open dictionary cursor to read through, e.g.
+                one inside a migration transaction; a pooled connection is
+                used otherwise.
+        """
+        if cursor is None:
+            with get_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+                try:
+                    self.refresh(cursor)
+                finally:
+                    cursor.close()
+            return
+
+        with self._lock:
+            if self._refreshed_at is None and self.bloom:
+                cursor.execute(f"SELECT COUNT(*) AS cnt FROM {self.table_name}")
+                # Room to grow before the false positive rate degrades
+                self._filter = BloomFilter(capacity=2 * cursor.fetchone()["cnt"] + 1000)
+
+            for rows in fetch_in_chunks(cursor, self.table_name, self.key_column,
+                                        [self.natural_key], f"{self.key_column} > {int(self._last_id)}",
+                                        CHUNK_SIZE):
+                for row in rows:
+                    key = normalize_key(row[self.natural_key])
+                    if key is None:
+                        continue
+                    if self.bloom:
+                        self._filter.add(key)
+                    else:
+                        self._ids.setdefault(key, row[self.key_column])
+                self._last_id = rows[-1][self.key_column]
+            self._refreshed_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        if self._refreshed_at is None or time.monotonic() - self._refreshed_at > self.max_age:
+            self.refresh()
+
+    def add(self, value, key_id):
+        """Records a row just written through this process."""
+        key = normalize_key(value)
+        if key is None:
+            return
+        with self._lock:
+            if self._refreshed_at is None:
+                return
+            if self.bloom:
+                self._filter.add(key)
+            else:
+                self._ids.setdefault(key, key_id)
+
+    def get(self, value, refresh=True):
+        """
+        Returns the id of the row holding value, or None.
+
+        Args:
+            value: Natural key value to look up.
+            refresh (bool): Refresh first if the index is older than
+                max_age; callers that refresh explicitly pass False.
+        """
+        key = normalize_key(value)
+        if key is None:
+            return None
+        if refresh:
+            self._ensure_fresh()
+
+        with self._lock:
+            if not self.bloom:
+                return self._ids.get(key)
+            if key not in self._filter:
+                return None
+
+        # Possible hit: confirm with the database
+        with get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(
+                f"SELECT {self.key_column} FROM {self.table_name} "
+                f"WHERE {self.natural_key} = %s LIMIT 1",
+                (str(value).strip(),)
+            )
+            row = cursor.fetchone()
+            cursor.close()
+        return row[self.key_column] if row else None
+
+    def __contains__(self, value):
+        return self.get(value) is not None
+
+
+# =====================================================
+# SHARED INDEXES
+# One instance per table for the whole process (Streamlit reruns and
+# migration workers share them).
+# =====================================================
+_INDEX_DEFINITIONS = {
+    "customers": ("customer_id", "phone"),
+    "customers_raw": ("customer_id", "phone"),
+    "products": ("product_id", "product_name"),
+    "products_raw": ("product_id", "product_name"),
+}
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(table_name):
+    """Returns the shared NaturalKeyIndex of a table."""
+    with _indexes_lock:
+        if table_name not in _indexes:
+            key_column, natural_key = _INDEX_DEFINITIONS[table_name]
+            _indexes[table_name] = NaturalKeyIndex(table_name, key_column, natural_key)
+        return _indexes[table_name]
+
+
+def invalidate_index(*table_names):
+    """Drops the shared indexes of tables whose keys were changed or deleted."""
+    with _indexes_lock:
+        indexes = [_indexes[t] for t in table_names if t in _indexes]
+    for index in indexes:
+        index.invalidate()
+
+
+def find_duplicate(table_name, value):
+    """
+    Finds where a natural key value already exists, raw table or main.
+
+    Args:
+        table_name (str): "customers" or "products".
+        value: Phone or product name being entered.
+
+    Returns:
+        str or None: The table holding value, or None if it is new.
+    """
+    for table in (f"{table_name}_raw", table_name):
+        if get_index(table).get(value) is not None:
+            return table
+    return None
@@ -0,0 +1,58 @@
+import pandas as pd
+
+# Currency markers stripped before parsing (symbols and common codes)
+CURRENCY_PATTERN = r"(?i)(₹|\$|€|£|¥|(?<![a-z])(?:rs\.?|inr|usd|eur|gbp)(?![a-z]))"
+
+# Spaces, non-breaking spaces and apostrophes used as thousands separators
+GROUPING_PATTERN = r"[\s\u00a0\u202f']"
+
+# "1,234", "12,345,678" and Indian "1,23,456": commas that group thousands
+COMMA_THOUSANDS_PATTERN = r"-?\d{1,3}(?:,\d{2})*,\d{3}(?:\.\d+)?|-?\d{1,3}(?:,\d{3})+(?:\.\d+)?"
+
+
+def normalize_prices(values):
+    """
+    Parses price strings into floats, vectorized over a whole column.
+
+    Handles currency symbols and codes (₹, $, €, £, Rs, INR, ...),
+    thousands separators (1,234.50 / 1.234,50 / 1 234,50 / 1,23,456) and
+    decimal commas (12,5). When both ',' and '.' appear the right-most one
+    is the decimal separator; a lone ',' is a thousands separator only if
+    it groups digits in threes (or Indian lakh style), otherwise it is a
+    decimal comma.
+
+    Args:
+        values (pd.Series or list): Raw price values (str, number or None).
+
+    Returns:
+        tuple: (prices, failed)
+            prices (pd.Series of float): Parsed prices, NaN where parsing failed.
+            failed (pd.Series of bool): True for missing or unparsable values.
+    """
+    raw = pd.Series(values)
+    s = (
+        raw.astype("str")
+        .str.replace(CURRENCY_PATTERN, "", regex=True)
+        .str.replace(GROUPING_PATTERN, "", regex=True)
+    )
+
+    last_comma = s.str.rfind(",")
+    last_dot = s.str.rfind(".")
+    has_comma = last_comma >= 0
+    has_dot = last_dot >= 0
+
+    comma_groups_thousands = s.str.fullmatch(COMMA_THOUSANDS_PATTERN).fillna(False).astype(bool)
+    comma_is_decimal = has_comma & (last_comma > last_dot) & (has_dot | ~comma_groups_thousands)
+    # "1.234.567" with no comma: the dots group thousands
+    dots_group_thousands = ~has_comma & (s.str.count(r"\.") > 1)
+
+    normalized = s.str.replace(",", "", regex=False)
+    normalized = normalized.mask(
+        comma_is_decimal,
+        s.str.replace(".", "", regex=False).str.replace(",", ".", regex=False),
+    )
+    normalized = normalized.mask(dots_group_thousands, s.str.replace(".", "", regex=False))
+
+    prices = pd.to_numeric(normalized, errors="coerce").astype("float64")
+    failed = prices.isna()
+    return prices, failed
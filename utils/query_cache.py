@@ -0,0 +1,351 @@
+from dotenv import load_dotenv
+from collections import OrderedDict
+from functools import wraps
+from utils.database_connection import get_connection
+from mysql.connector import Error
+import pandas as pd
+import os
+import re
+import sys
+import threading
+import time
+
+# Loading environment variables
+load_dotenv()
+
+# Time-to-live of cached_call() results. Freshness does not depend on it:
+# every hit is checked against the shared table versions below
+QUERY_CACHE_MAX_AGE = float(os.getenv("QUERY_CACHE_MAX_AGE", 300))
+
+# Memory budget and default time-to-live of the SQL result cache
+RESULT_CACHE_MAX_BYTES = int(float(os.getenv("RESULT_CACHE_MAX_MB", 64)) * 1024 * 1024)
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", 60))
+
+# How often this process re-reads the shared table_versions table; this
+# bounds how long a write made by another process (CLI scripts, other
+# app instances) can go unnoticed
+SHARED_VERSIONS_INTERVAL = float(os.getenv("SHARED_VERSIONS_INTERVAL", 1))
+
+
+# =====================================================
+# TABLE VERSIONS
+# Every write function bumps the version of the tables it changes, in
+# this process and in the table_versions table shared by every process.
+# Cached results remember the versions they were computed at and are
+# only served while those versions have not moved.
+# =====================================================
+_versions = {}
+_lock = threading.Lock()
+
+_shared = {"versions": {}, "read_at": None}
+_shared_lock = threading.Lock()
+
+
+def _shared_versions():
+    """
+    Versions from the table_versions table, re-read at most every
+    SHARED_VERSIONS_INTERVAL seconds (one small primary-key scan).
+
+    Returns None if they cannot be read; the cache then falls back to
+    the in-process versions and the TTLs.
+    """
+    with _shared_lock:
+        read_at = _shared["read_at"]
+        if read_at is not None and time.monotonic() - read_at < SHARED_VERSIONS_INTERVAL:
+            return _shared["versions"]
+        try:
+            with get_connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute("SELECT table_name, version FROM table_versions")
+                    _shared["versions"] = dict(cursor.fetchall())
+                finally:
+                    cursor.close()
+        except (Error, ConnectionError) as e:
+            print(f"Could not read table_versions: {e}")
+            _shared["versions"] = None
+        _shared["read_at"] = time.monotonic()
+        return _shared["versions"]
+
+
+def _bump_shared(table_names):
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.executemany(
+                    """INSERT INTO table_versions (table_name, version) VALUES (%s, 1)
+                       ON DUPLICATE KEY UPDATE version = version + 1""",
+                    [(table,) for table in table_names]
+                )
+                conn.commit()
+            finally:
+                cursor.close()
+    except (Error, ConnectionError) as e:
+        print(f"Could not bump table_versions for {', '.join(table_names)}: {e}")
+    # Make this process see its own bump on the next lookup
+    with _shared_lock:
+        _shared["read_at"] = None
+
+
+def bump_tables(*table_names):
+    """Marks tables as changed, invalidating every cached read of them in every process."""
+    with _lock:
+        for table in table_names:
+            _versions[table] = _versions.get(table, 0) + 1
+    RESULT_CACHE.invalidate(*table_names)
+    if table_names:
+        _bump_shared(table_names)
+
+
+def table_versions(table_names):
+    """
+    Current version of each table, as a tuple in the given order:
+    (in-process version, shared version) per table.
+    """
+    shared = _shared_versions()
+    with _lock:
+        return tuple(
+            (_versions.get(table, 0), None if shared is None else shared.get(table, 0))
+            for table in table_names
+        )
+
+
+def invalidates(*table_names):
+    """
+    Decorator for write functions: bumps table_names after every call.
+
+    The bump also happens when the call fails, since a partial write may
+    have been committed; an unneeded bump only costs one cache miss.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                bump_tables(*table_names)
+        return wrapper
+    return decorator
+
+
+# =====================================================
+# SQL RESULT CACHE
+# Shared by everything in the process (Streamlit pages, ETL stages, CLI
+# scripts and their worker threads).
+# =====================================================
+def _sizeof(value):
+    """Approximate memory footprint of a query result, in bytes."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_sizeof(k) + _sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache of query results, bounded by memory size.
+
+    Each entry expires after its TTL and is dropped as soon as one of the
+    tables it read is invalidated in this process. Entries stored with
+    the table_versions() they were computed at are also dropped on lookup
+    once those versions move, which catches writes made by other
+    processes. When the memory budget is exceeded the
+    least recently used entries are evicted first. Cached values are
+    shared between callers and must not be modified.
+    """
+
+    def __init__(self, max_bytes=RESULT_CACHE_MAX_BYTES, ttl=RESULT_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (value, size, expires_at, tables, versions)
+        self._keys_by_table = {}        # table -> set of keys
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _drop(self, key):
+        value, size, expires_at, tables, versions = self._entries.pop(key)
+        self._bytes -= size
+        for table in tables:
+            keys = self._keys_by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_table[table]
+
+    def get(self, key):
+        """Returns (True, value) on a hit, (False, None) on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+        # Checked outside the lock: it may read table_versions
+        stale = entry is not None and (
+            entry[2] < time.monotonic()
+            or (entry[4] is not None and table_versions(entry[3]) != entry[4])
+        )
+        with self._lock:
+            if stale and self._entries.get(key) is entry:
+                self._drop(key)
+            if entry is None or stale:
+                self.misses += 1
+                return False, None
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def put(self, key, value, tables, ttl=None, versions=None):
+        """
+        Stores value for key. versions, if given, are the
+        table_versions(tables) the value was computed at.
+        """
+        size = _sizeof(value)
+        # A single result larger than the whole budget is not kept
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        tables = tuple(tables)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, size, expires_at, tables, versions)
+            self._bytes += size
+            for table in tables:
+                self._keys_by_table.setdefault(table, set()).add(key)
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, *table_names):
+        """Drops every entry that read one of table_names; returns how many."""
+        with self._lock:
+            keys = set()
+            for table in table_names:
+                keys |= self._keys_by_table.get(table, set())
+            for key in keys:
+                self._drop(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_table.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+RESULT_CACHE = ResultCache()
+
+
+_TABLE_PATTERN = re.compile(r"\b(?:FROM|JOIN)\s+`?(\w+)`?", re.IGNORECASE)
+
+
+def normalize_sql(query):
+    """Collapses whitespace and drops a trailing ';' so equivalent SQL shares a key."""
+    return " ".join(query.split()).rstrip(";").rstrip()
+
+
+def tables_in(query):
+    """Names of the tables a SELECT reads (FROM / JOIN targets)."""
+    return {name.lower() for name in _TABLE_PATTERN.findall(query)}
+
+
+def cached_query(query, params=(), ttl=None, tables=None):
+    """
+    Runs a SELECT through the shared result cache.
+
+    The key is the normalized SQL text plus the parameters. The result
+    (list of dict rows) is reused until its TTL runs out or one of the
+    tables it reads is written through bump_tables() / @invalidates, in
+    this process or (noticed within SHARED_VERSIONS_INTERVAL) another one.
+
+    Args:
+        query (str): SELECT statement with %s placeholders.
+        params (sequence): Query parameters.
+        ttl (float, optional): Seconds to keep the result (default
+            RESULT_CACHE_TTL).
+        tables (iterable, optional): Tables to invalidate on; parsed from
+            the FROM / JOIN clauses when omitted.
+
+    Returns:
+        list of dict: The rows; shared, do not modify.
+    """
+    normalized = normalize_sql(query)
+    key = ("sql", normalized, tuple(params))
+    found, rows = RESULT_CACHE.get(key)
+    if found:
+        return rows
+
+    tables = tuple(tables if tables is not None else tables_in(normalized))
+    versions = table_versions(tables)
+    with get_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+
+    if table_versions(tables) == versions:
+        RESULT_CACHE.put(key, rows, tables, ttl, versions)
+    return rows
+
+
+# =====================================================
+# CACHED READS
+# =====================================================
+def cached_call(table_names, func, *args, **kwargs):
+    """
+    Returns func(*args, **kwargs), reusing the last result while none of
+    table_names has been written since (by any process, see
+    table_versions()) and it is younger than QUERY_CACHE_MAX_AGE.
+
+    Functions are keyed by module and qualified name rather than identity,
+    so functions defined inside a Streamlit page share results across
+    reruns. Cached values are shared: callers must not modify them.
+    """
+    table_names = tuple(table_names)
+    key = ("call", func.__module__, func.__qualname__, table_names, args,
+           tuple(sorted(kwargs.items())))
+    found, value = RESULT_CACHE.get(key)
+    if found:
+        return value
+
+    versions = table_versions(table_names)
+    value = func(*args, **kwargs)
+    # The read helpers return False / None on errors; never cache those
+    if value is False or value is None:
+        return value
+    # A write that landed while func ran may not be reflected in value
+    if table_versions(table_names) == versions:
+        RESULT_CACHE.put(key, value, table_names, QUERY_CACHE_MAX_AGE, versions)
+    return value
+
+
+def cached_read(*table_names):
+    """Decorator form of cached_call() for reads of fixed tables."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return cached_call(table_names, func, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,231 @@
+from dotenv import load_dotenv
+from utils.database_connection import get_connection
+from utils.batch_operations import CHUNK_SIZE
+from utils.columnar_fetch import fetch_frame
+from utils.natural_key_index import invalidate_index
+from utils.query_cache import bump_tables
+from mysql.connector import Error
+import pandas as pd
+import glob
+import os
+
+# Loading environment variables
+load_dotenv()
+
+# Root folder of the Parquet archive
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+
+# raw table -> (primary key, mapping table, date column used for partitions)
+RAW_TABLES = {
+    "customers_raw": ("customer_id", "customer_mapping", "created_at"),
+    "products_raw": ("product_id", "product_mapping", "added_at"),
+    "orders_raw": ("order_id", "order_mapping", "order_date"),
+    "sales_raw": ("sale_id", "sale_mapping", "sale_date"),
+}
+
+ARCHIVE_TARGETS = ("table", "parquet")
+
+
+# =====================================================
+# WRITERS
+# =====================================================
+def _archive_chunk_table(cursor, raw_table, key_column, mapping_table, start, end):
+    # Copy into the compressed <raw>_archive table, then delete exactly
+    # the rows that were copied
+    cursor.execute(
+        f"""INSERT INTO {raw_table}_archive
+            SELECT r.*, NOW()
+            FROM {raw_table} r
+            JOIN {mapping_table} m ON m.raw_{key_column} = r.{key_column}
+            WHERE r.{key_column} BETWEEN %s AND %s""",
+        (start, end)
+    )
+    archived = cursor.rowcount
+    if archived:
+        cursor.execute(
+            f"""DELETE r FROM {raw_table} r
+                JOIN {raw_table}_archive a ON a.{key_column} = r.{key_column}
+                WHERE r.{key_column} BETWEEN %s AND %s""",
+            (start, end)
+        )
+    return archived
+
+
+def _archive_chunk_parquet(cursor, raw_table, key_column, mapping_table, date_column, start, end, pending):
+    # One file per month per chunk:
+    # <ARCHIVE_DIR>/<raw>/month=YYYY-MM/part-<first id>-<last id>.parquet
+    # Files are written as <name>.tmp and appended to pending; the caller
+    # renames them only once the DELETE has committed
+    df = fetch_frame(
+        cursor,
+        f"""SELECT r.*
+            FROM {raw_table} r
+            JOIN {mapping_table} m ON m.raw_{key_column} = r.{key_column}
+            WHERE r.{key_column} BETWEEN %s AND %s
+            ORDER BY r.{key_column}
+            FOR UPDATE""",
+        (start, end)
+    )
+    if df.empty:
+        return 0
+
+    months = pd.to_datetime(df[date_column]).dt.strftime("%Y-%m").fillna("unknown")
+    for month, part in df.groupby(months):
+        folder = os.path.join(ARCHIVE_DIR, raw_table, f"month={month}")
+        os.makedirs(folder, exist_ok=True)
+        first, last = part[key_column].iat[0], part[key_column].iat[-1]
+        path = os.path.join(folder, f"part-{first}-{last}.parquet")
+        part.to_parquet(path + ".tmp", index=False, compression="zstd")
+        pending.append(path)
+
+    ids = [int(i) for i in df[key_column]]
+    cursor.execute(
+        f"DELETE FROM {raw_table} WHERE {key_column} IN ({', '.join(['%s'] * len(ids))})",
+        ids
+    )
+    return len(ids)
+
+
+def _discard_parts(paths):
+    for path in paths:
+        if os.path.exists(path + ".tmp"):
+            os.remove(path + ".tmp")
+
+
+def _recover_parquet_parts(cursor, raw_table, key_column):
+    """
+    Settles .tmp files left by a run that stopped between its DELETE and
+    the rename: if none of a file's ids is still in the raw table the
+    chunk committed and the file is kept, otherwise it is dropped (the
+    rows are still in the raw table and will be archived again).
+    """
+    for tmp in glob.glob(os.path.join(ARCHIVE_DIR, raw_table, "month=*", "part-*-*.parquet.tmp")):
+        ids = [int(i) for i in pd.read_parquet(tmp, columns=[key_column])[key_column]]
+        if not ids:
+            os.remove(tmp)
+            continue
+        cursor.execute(
+            f"SELECT COUNT(*) AS cnt FROM {raw_table} WHERE {key_column} IN ({', '.join(['%s'] * len(ids))})",
+            ids
+        )
+        if cursor.fetchone()["cnt"]:
+            os.remove(tmp)
+        else:
+            os.replace(tmp, tmp[:-len(".tmp")])
+
+
+def archive_raw_table(raw_table, target="table", chunk_size=CHUNK_SIZE):
+    """
+    Moves the migrated rows of a raw table out of the hot table.
+
+    Rows that have a mapping entry are copied to the archive and deleted
+    from the raw table, one primary-key range of chunk_size ids per
+    transaction, so preprocessing and migration keep scanning small
+    tables while raw history is kept.
+
+    Targets:
+        "table"   - <raw>_archive, an InnoDB table with compressed rows
+                    and an archived_at column (see DataPulse_schema.sql).
+        "parquet" - zstd-compressed Parquet files under ARCHIVE_DIR,
+                    partitioned by month of the row's date column;
+                    needs pyarrow. Files get their final name only
+                    after the chunk's DELETE commits, so a failed and
+                    retried run never archives a row twice.
+
+    Returns:
+        dict: {"status", "archived_count", "chunks"} or an error dict.
+    """
+    if target not in ARCHIVE_TARGETS:
+        raise ValueError(f"Unknown archive target '{target}', expected one of {ARCHIVE_TARGETS}")
+    key_column, mapping_table, date_column = RAW_TABLES[raw_table]
+    archived_count = 0
+    chunks = 0
+
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                if target == "parquet":
+                    _recover_parquet_parts(cursor, raw_table, key_column)
+                cursor.execute(f"SELECT MIN({key_column}) AS lo, MAX({key_column}) AS hi FROM {raw_table}")
+                bounds = cursor.fetchone()
+
+                if bounds["lo"] is not None:
+                    for start in range(bounds["lo"], bounds["hi"] + 1, chunk_size):
+                        end = start + chunk_size - 1
+                        if target == "table":
+                            archived = _archive_chunk_table(cursor, raw_table, key_column,
+                                                            mapping_table, start, end)
+                            conn.commit()
+                        else:
+                            pending = []
+                            try:
+                                archived = _archive_chunk_parquet(cursor, raw_table, key_column, mapping_table,
+                                                                  date_column, start, end, pending)
+                                conn.commit()
+                            except BaseException:
+                                conn.rollback()
+                                _discard_parts(pending)
+                                raise
+                            # Only now are the rows gone from the raw table
+                            for path in pending:
+                                os.replace(path + ".tmp", path)
+                        archived_count += archived
+                        chunks += 1
+            finally:
+                cursor.close()
+
+        return {"status": "success", "archived_count": archived_count, "chunks": chunks}
+
+    except (Error, ConnectionError, ImportError, OSError) as e:
+        # Chunks committed before the error stay archived
+        return {"status": "error", "message": str(e), "archived_count": archived_count}
+
+    finally:
+        if archived_count:
+            bump_tables(raw_table, f"{raw_table}_archive")
+            if raw_table in ("customers_raw", "products_raw"):
+                invalidate_index(raw_table)
+
+
+def archive_all_raw(target="table", chunk_size=CHUNK_SIZE):
+    """Archives the migrated rows of every raw table; see archive_raw_table."""
+    return {
+        raw_table: archive_raw_table(raw_table, target, chunk_size)
+        for raw_table in RAW_TABLES
+    }
+
+
+# =====================================================
+# LOOKUP
+# =====================================================
+def lookup_archived(raw_table, raw_id):
+    """
+    Fetches an archived raw row by its raw id.
+
+    Looks in the <raw>_archive table first, then in the Parquet files
+    whose id range (from the file name) contains raw_id.
+
+    Returns:
+        dict or None: The archived row, or None if it is not archived.
+    """
+    key_column = RAW_TABLES[raw_table][0]
+
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(f"SELECT * FROM {raw_table}_archive WHERE {key_column} = %s", (raw_id,))
+            row = cursor.fetchone()
+            cursor.close()
+        if row:
+            return row
+    except Error as e:
+        print(f"Error reading {raw_table}_archive: {e}")
+
+    for path in glob.glob(os.path.join(ARCHIVE_DIR, raw_table, "month=*", "part-*-*.parquet")):
+        first, last = os.path.basename(path)[len("part-"):-len(".parquet")].split("-")
+        if int(first) <= raw_id <= int(last):
+            df = pd.read_parquet(path, filters=[(key_column, "==", raw_id)])
+            if not df.empty:
+                return df.iloc[0].to_dict()
+    return None
@@ -1,118 +1,119 @@
-import pandas as pd
+from functools import partial
 from mysql.connector import Error
-from utils.database_connection import create_connection
+from utils.database_connection import create_connection, get_connection
+from utils.dag_executor import run_stages
+from utils.batch_operations import BATCH_SIZE, CHUNK_SIZE
+from utils.cleaning_rules import run_rules
+from utils.natural_key_index import invalidate_index
+from utils.query_cache import invalidates
 
 
 # =====================================================
-# PREPROCESS CUSTOMERS
+# INCREMENTAL SCOPE
 # =====================================================
-def preprocess_raw_customer():
-    conn = create_connection()
-    cursor = conn.cursor(dictionary=True)
-
-    try:
-        # STEP 1: Load RAW tables
-        cursor.execute("SELECT * FROM customers_raw")
-        customer_df = pd.DataFrame(cursor.fetchall())
-
-        cursor.execute("SELECT * FROM orders_raw")
-        order_df = pd.DataFrame(cursor.fetchall())
-
-        cursor.execute("SELECT * FROM sales_raw")
-        sales_df = pd.DataFrame(cursor.fetchall())
-
-        # -------------------------------------------------
-        # STEP 2: Fill missing CITY
-        # -------------------------------------------------
-        empty_city = customer_df[customer_df["city"] == ""]
-
-        if order_df.empty or sales_df.empty:
-            # No inference possible -> fill Unknown
-            for _, row in empty_city.iterrows():
-                cursor.execute(
-                    "UPDATE customers_raw SET city=%s WHERE customer_id=%s",
-                    ("Unknown", row["customer_id"])
-                )
-            conn.commit()
-
-        else:
-            # Infer city from sales.region
-            for _, row in empty_city.iterrows():
-                cust_id = row["customer_id"]
-
-                cust_orders = order_df[order_df["customer_id"] == cust_id]
+def _pending_scope(cursor, table_name, key_column, full_rebuild):
+    """
+    Builds the row filter for one preprocessing run of a raw table.
+
+    Rows are flagged with is_cleaned = 1 once normalized; inserts start at
+    0 and the update_*_raw functions reset the flag when a row is edited.
+    An incremental run only touches flagged-0 rows up to the highest such
+    id seen at the start, so rows inserted mid-run wait for the next run.
+
+    Returns:
+        str: Predicate template with an {a} placeholder for the table alias
+             (e.g. scope.format(a="c.")), "TRUE" on a full rebuild, or None
+             if there is nothing pending.
+    """
+    if full_rebuild:
+        return "TRUE"
+
+    cursor.execute(
+        f"SELECT MAX({key_column}) AS high_water FROM {table_name} WHERE is_cleaned = 0"
+    )
+    high_water = cursor.fetchone()["high_water"]
+    if high_water is None:
+        return None
+    return f"{{a}}is_cleaned = 0 AND {{a}}{key_column} <= {int(high_water)}"
 
-                if cust_orders.empty:
-                    final_city = "Unknown"
-                else:
-                    order_ids = cust_orders["order_id"].tolist()
-                    related_sales = sales_df[
-                        (sales_df["order_id"].isin(order_ids)) &
-                        (sales_df["region"] != "")
-                    ]
 
-                    final_city = related_sales.iloc[0]["region"] if not related_sales.empty else "Unknown"
+# =====================================================
+# CLEANING RULE SETS
+# Each column's rules run in order; see utils/cleaning_rules.py. Adding a
+# rule here does not add another pass over the table.
+# =====================================================
+CUSTOMER_RULES = {
+    "customer_name": ["trim", "collapse_spaces", "title"],
+    "email": ["trim", ("default_if_empty", "Unknown"), "lower"],
+    "city": ["trim", "title"],
+}
+
+SALE_RULES = {
+    # c is customers_raw joined through orders_raw (see SALE_JOINS)
+    "region": [("fill_empty_from", "COALESCE(c.city, 'Unknown')"), "trim", "capitalize"],
+}
+
+SALE_JOINS = """
+    LEFT JOIN orders_raw o ON o.order_id = s.order_id
+    LEFT JOIN customers_raw c
+        ON c.customer_id = o.customer_id
+        AND c.city IS NOT NULL AND c.city != ''
+"""
+
+PRODUCT_RULES = {
+    "product_name": [("default_if_empty", "Unnamed Product"), "trim", "collapse_spaces", "title"],
+    "category": [("default_if_empty", "Unknown"), "trim", "title"],
+    "selling_price": ["parse_price"],
+    "cost_price": ["parse_price"],
+    "stock": ["clamp_non_negative"],
+}
 
-                cursor.execute(
-                    "UPDATE customers_raw SET city=%s WHERE customer_id=%s",
-                    (final_city, cust_id)
-                )
 
-            conn.commit()
+# =====================================================
+# PREPROCESS CUSTOMERS
+# =====================================================
+@invalidates("customers_raw")
+def preprocess_raw_customer(batch_size=BATCH_SIZE, full_rebuild=False, chunk_size=CHUNK_SIZE):
+    conn = create_connection()
+    cursor = conn.cursor(dictionary=True)
 
-        # -------------------------------------------------
-        # STEP 3: Fill missing EMAIL
-        # -------------------------------------------------
-        empty_email = customer_df[customer_df["email"] == ""]
-        for _, row in empty_email.iterrows():
-            cursor.execute(
-                "UPDATE customers_raw SET email=%s WHERE customer_id=%s",
-                ("Unknown", row["customer_id"])
-            )
-        conn.commit()
+    try:
+        scope = _pending_scope(cursor, "customers_raw", "customer_id", full_rebuild)
+        if scope is None:
+            return True
 
         # -------------------------------------------------
-        # STEP 4: Cleanup (trim, lowercase, remove extra spaces)
+        # STEP 1: Fill missing CITY
+        # City is inferred from the region of the customer's first
+        # (lowest sale_id) sale with a non-empty region, in one
+        # set-based UPDATE. Customers without such a sale get "Unknown".
         # -------------------------------------------------
-        cleanup_queries = [
-            """
-            UPDATE customers_raw
-            SET customer_name = TRIM(customer_name),
-                email = TRIM(email),
-                city = TRIM(city)
-            """,
-
-            "UPDATE customers_raw SET email = LOWER(email)",
-
-            """
-            UPDATE customers_raw
-            SET customer_name = REGEXP_REPLACE(customer_name, '\\s+', ' ')
-            """
-        ]
-
-        for q in cleanup_queries:
-            cursor.execute(q)
+        cursor.execute(f"""
+            UPDATE customers_raw c
+            LEFT JOIN (
+                SELECT o.customer_id, s.region
+                FROM sales_raw s
+                JOIN orders_raw o ON o.order_id = s.order_id
+                JOIN (
+                    SELECT o2.customer_id, MIN(s2.sale_id) AS first_sale_id
+                    FROM sales_raw s2
+                    JOIN orders_raw o2 ON o2.order_id = s2.order_id
+                    WHERE s2.region IS NOT NULL AND s2.region != ''
+                    GROUP BY o2.customer_id
+                ) f ON f.customer_id = o.customer_id AND f.first_sale_id = s.sale_id
+            ) inferred ON inferred.customer_id = c.customer_id
+            SET c.city = COALESCE(inferred.region, 'Unknown')
+            WHERE c.city = '' AND {scope.format(a="c.")}
+        """)
         conn.commit()
 
         # -------------------------------------------------
-        # STEP 5: Title Case name + city
+        # STEP 2: Apply CUSTOMER_RULES in one streamed pass
         # -------------------------------------------------
-        cursor.execute("SELECT customer_id, customer_name, city FROM customers_raw")
-        rows = cursor.fetchall()
-
-        for r in rows:
-            clean_name = r["customer_name"].title() if r["customer_name"] else ""
-            clean_city = r["city"].title() if r["city"] else ""
-
-            cursor.execute(
-                """
-                UPDATE customers_raw
-                SET customer_name=%s, city=%s
-                WHERE customer_id=%s
-                """,
-                (clean_name, clean_city, r["customer_id"])
-            )
+        run_rules(cursor, conn, "customers_raw", "customer_id", CUSTOMER_RULES,
+                  scope, batch_size=batch_size, chunk_size=chunk_size)
 
+        cursor.execute(f"UPDATE customers_raw SET is_cleaned = 1 WHERE {scope.format(a='')}")
         conn.commit()
         return True
 
@@ -129,79 +130,22 @@ def preprocess_raw_customer():
 # =====================================================
 # PREPROCESS SALES
 # =====================================================
-def preprocess_raw_sale():
+@invalidates("sales_raw")
+def preprocess_raw_sale(full_rebuild=False):
     conn = create_connection()
     cursor = conn.cursor(dictionary=True)
 
     try:
-        cursor.execute("SELECT * FROM customers_raw")
-        customers_df = pd.DataFrame(cursor.fetchall())
-
-        cursor.execute("SELECT * FROM orders_raw")
-        orders_df = pd.DataFrame(cursor.fetchall())
-
-        cursor.execute("SELECT * FROM sales_raw")
-        sales_df = pd.DataFrame(cursor.fetchall())
+        scope = _pending_scope(cursor, "sales_raw", "sale_id", full_rebuild)
+        if scope is None:
+            return True
 
-        empty_region_sales = sales_df[sales_df["region"] == ""]
-
-        # -------------------------------------------------
-        # CASE 1: Cannot infer -> fill Unknown
-        # -------------------------------------------------
-        if customers_df.empty or orders_df.empty:
-            for _, row in empty_region_sales.iterrows():
-                cursor.execute(
-                    "UPDATE sales_raw SET region=%s WHERE sale_id=%s",
-                    ("Unknown", row["sale_id"])
-                )
-            conn.commit()
-
-        else:
-            # -------------------------------------------------
-            # CASE 2: Infering region using customers.city
-            # -------------------------------------------------
-            for _, row in empty_region_sales.iterrows():
-                sale_id = row["sale_id"]
-
-                related_orders = orders_df[orders_df["order_id"] == row["order_id"]]
-
-                if related_orders.empty:
-                    final_region = "Unknown"
-                else:
-                    customer_ids = related_orders["customer_id"].tolist()
-
-                    related_customers = customers_df[
-                        (customers_df["customer_id"].isin(customer_ids)) &
-                        (customers_df["city"] != "")
-                    ]
-
-                    final_region = related_customers.iloc[0]["city"] if not related_customers.empty else "Unknown"
-
-                cursor.execute(
-                    "UPDATE sales_raw SET region=%s WHERE sale_id=%s",
-                    (final_region, sale_id)
-                )
-
-            conn.commit()
-
-        # -------------------------------------------------
-        # STEP 4: Clean region
-        # -------------------------------------------------
-        cursor.execute("""
-            UPDATE sales_raw
-            SET region = TRIM(region)
-            WHERE region IS NOT NULL;
-        """)
-
-        cursor.execute("""
-            UPDATE sales_raw
-            SET region = CONCAT(
-                UPPER(LEFT(region, 1)),
-                LOWER(SUBSTRING(region, 2))
-            )
-            WHERE region IS NOT NULL AND region != '';
-        """)
+        # SALE_RULES compile to a single UPDATE: the missing region is
+        # filled from the customer's city and cleaned in one pass
+        run_rules(cursor, conn, "sales_raw", "sale_id", SALE_RULES,
+                  scope, joins=SALE_JOINS, alias="s")
 
+        cursor.execute(f"UPDATE sales_raw SET is_cleaned = 1 WHERE {scope.format(a='')}")
         conn.commit()
         return True
 
@@ -218,93 +162,28 @@ def preprocess_raw_sale():
 # =====================================================
 # PREPROCESS PRODUCTS
 # =====================================================
-def preprocess_raw_product():
+@invalidates("products_raw")
+def preprocess_raw_product(batch_size=BATCH_SIZE, full_rebuild=False, chunk_size=CHUNK_SIZE):
     conn = create_connection()
     cursor = conn.cursor(dictionary=True)
 
     try:
-        # Empty name -> Unnamed Product
-        cursor.execute("""
-            UPDATE products_raw
-            SET product_name='Unnamed Product'
-            WHERE TRIM(product_name) = '' OR product_name IS NULL;
-        """)
-
-        # Empty category -> Unknown
-        cursor.execute("""
-            UPDATE products_raw
-            SET category='Unknown'
-            WHERE TRIM(category) = '' OR category IS NULL;
-        """)
-
-        conn.commit()
-
-        # Trim spaces
-        cursor.execute("""
-            UPDATE products_raw
-            SET product_name = TRIM(product_name),
-                category = TRIM(category),
-                selling_price = TRIM(selling_price),
-                cost_price = TRIM(cost_price);
-        """)
-        conn.commit()
-
-        # Remove multiple spaces
-        cursor.execute("""
-            UPDATE products_raw
-            SET product_name = REGEXP_REPLACE(product_name, '\\s+', ' ');
-        """)
-        conn.commit()
-
-        # Title-case name + category
-        cursor.execute("SELECT product_id, product_name, category FROM products_raw")
-        rows = cursor.fetchall()
+        scope = _pending_scope(cursor, "products_raw", "product_id", full_rebuild)
+        if scope is None:
+            return True
 
-        for r in rows:
-            clean_name = r["product_name"].title()
-            clean_cat = r["category"].title()
+        outcome = run_rules(cursor, conn, "products_raw", "product_id", PRODUCT_RULES,
+                            scope, batch_size=batch_size, chunk_size=chunk_size)
 
-            cursor.execute("""
-                UPDATE products_raw
-                SET product_name=%s, category=%s
-                WHERE product_id=%s
-            """, (clean_name, clean_cat, r["product_id"]))
+        # Unparsable prices are left untouched and reported, not zeroed
+        for column, product_ids in outcome["failed"].items():
+            print(f"Could not parse {column} for {len(product_ids)} product(s): {product_ids}")
 
+        cursor.execute(f"UPDATE products_raw SET is_cleaned = 1 WHERE {scope.format(a='')}")
         conn.commit()
-
-        # Converting price strings -> float
-        cursor.execute("SELECT product_id, selling_price, cost_price FROM products_raw")
-        rows = cursor.fetchall()
-
-        def clean_price(v):
-            if v is None:
-                return 0
-            v = str(v).replace(",", "").replace("₹", "").replace("$", "").strip()
-            try:
-                return float(v)
-            except:
-                return 0
-
-        for r in rows:
-            pid = r["product_id"]
-            sp = clean_price(r["selling_price"])
-            cp = clean_price(r["cost_price"])
-
-            cursor.execute("""
-                UPDATE products_raw
-                SET selling_price=%s, cost_price=%s
-                WHERE product_id=%s
-            """, (sp, cp, pid))
-
-        conn.commit()
-
-        # Stock cannot be negative
-        cursor.execute("""
-            UPDATE products_raw
-            SET stock = CASE WHEN stock < 0 THEN 0 ELSE stock END;
-        """)
-        conn.commit()
-
+        # Product names may have been rewritten (trimmed, title-cased)
+        if outcome["changed"]:
+            invalidate_index("products_raw")
         return True
 
     except Error as e:
@@ -320,45 +199,62 @@ def preprocess_raw_product():
 # =====================================================
 # MASTER FUNCTION
 # =====================================================
-def preprocess_all_raw():
-    conn = create_connection()
-    cursor = conn.cursor(dictionary=True)
-
-    results = {"customers": "", "sales": "", "products": ""}
+def preprocess_all_raw(full_rebuild=False, max_workers=2):
+    """
+    Preprocesses all raw tables.
+
+    By default only rows not yet cleaned (new or edited since the last run)
+    are processed; full_rebuild=True re-cleans every row.
+
+    Stages run concurrently on separate pooled connections where the data
+    allows it: sales waits for customers (its region is inferred from the
+    cleaned customer city), while products are independent of both.
+
+    Returns:
+        dict: table -> {"status": str, "rows": int, "seconds": float}
+    """
+    results = {"customers": None, "sales": None, "products": None}
+    pending = "" if full_rebuild else " WHERE is_cleaned = 0"
+    skip_reason = "empty" if full_rebuild else "has no new or edited rows"
+
+    # stage -> (function, raw table, stages it depends on)
+    stage_plan = {
+        "customers": (preprocess_raw_customer, "customers_raw", []),
+        "sales": (preprocess_raw_sale, "sales_raw", ["customers"]),
+        "products": (preprocess_raw_product, "products_raw", []),
+    }
 
     try:
-        cursor.execute("SELECT COUNT(*) AS c FROM customers_raw")
-        cust_count = cursor.fetchone()["c"]
-
-        cursor.execute("SELECT COUNT(*) AS c FROM sales_raw")
-        sales_count = cursor.fetchone()["c"]
-
-        cursor.execute("SELECT COUNT(*) AS c FROM products_raw")
-        prod_count = cursor.fetchone()["c"]
-
-        # Process customers
-        if cust_count > 0:
-            results["customers"] = "Success" if preprocess_raw_customer() else "Failed"
-        else:
-            results["customers"] = "Skipped (customers_raw empty)"
-
-        # Process sales
-        if sales_count > 0:
-            results["sales"] = "Success" if preprocess_raw_sale() else "Failed"
-        else:
-            results["sales"] = "Skipped (sales_raw empty)"
+        # One round trip for all row counts
+        with get_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(f"""
+                SELECT
+                    (SELECT COUNT(*) FROM customers_raw{pending}) AS customers,
+                    (SELECT COUNT(*) FROM sales_raw{pending}) AS sales,
+                    (SELECT COUNT(*) FROM products_raw{pending}) AS products
+            """)
+            counts = cursor.fetchone()
+            cursor.close()
+
+        stages = {}
+        for name, (func, table, deps) in stage_plan.items():
+            if counts[name] > 0:
+                stages[name] = (
+                    partial(func, full_rebuild=full_rebuild),
+                    [dep for dep in deps if counts[dep] > 0],
+                )
+            else:
+                results[name] = {"status": f"Skipped ({table} {skip_reason})", "rows": 0, "seconds": 0.0}
 
-        # Process products
-        if prod_count > 0:
-            results["products"] = "Success" if preprocess_raw_product() else "Failed"
-        else:
-            results["products"] = "Skipped (products_raw empty)"
+        for name, outcome in run_stages(stages, max_workers).items():
+            if "error" in outcome:
+                status = f"Failed ({outcome['error']})"
+            else:
+                status = "Success" if outcome["result"] else "Failed"
+            results[name] = {"status": status, "rows": counts[name], "seconds": outcome["seconds"]}
 
         return results
 
     except Exception as e:
         return {"error": str(e)}
-
-    finally:
-        cursor.close()
-        conn.close()
@@ -0,0 +1,128 @@
+import io
+import pandas as pd
+import pytest
+import utils.bulk_import as bulk_import
+from utils.bulk_import import read_import_file, validate_rows
+
+
+class _Index:
+    def __init__(self, keys=()):
+        self.keys = set(keys)
+
+    def refresh(self, cursor=None):
+        pass
+
+    def get(self, value, refresh=True):
+        return 1 if value in self.keys else None
+
+
+@pytest.fixture(autouse=True)
+def no_database(monkeypatch):
+    # Natural keys already stored: phone 999 and product "widget"
+    indexes = {"customers_raw": _Index({"999", "9876543210"}), "customers": _Index(),
+               "products_raw": _Index(), "products": _Index({"widget"})}
+    monkeypatch.setattr(bulk_import, "get_index", indexes.__getitem__)
+    monkeypatch.setattr(bulk_import, "_known_ids", lambda tables, ids: {1, 2})
+
+
+def _file(text):
+    return read_import_file(io.StringIO(text), "import.csv")
+
+
+def _reasons(rejected):
+    return dict(zip(rejected["line"], rejected["reason"]))
+
+
+def test_customers_rejections():
+    accepted, rejected = validate_rows("customers_raw", _file(
+        "Customer_Name, Phone ,city\n"
+        "Asha,111,Pune\n"
+        ",112,\n"
+        "Ravi,999,\n"
+        "Meera,111,\n"
+        + "X" * 51 + ",113,\n"
+    ))
+    assert accepted["customer_name"].tolist() == ["Asha"]
+    assert _reasons(rejected) == {
+        3: "missing customer_name",
+        4: "phone already exists",
+        5: "phone repeated in file",
+        6: "customer_name longer than 50",
+    }
+
+
+def test_phones_normalized_before_checks():
+    accepted, rejected = validate_rows("customers_raw", _file(
+        "customer_name,phone\n"
+        "Asha,098765 12345\n"
+        "Ravi,+91 98765 43210\n"
+        "Meera,98765 12345\n"
+        "Kiran,98765 432101\n"
+        "Dev,call me\n"
+    ))
+    assert accepted["phone"].tolist() == ["9876512345"]
+    assert _reasons(rejected) == {
+        3: "phone already exists",
+        4: "phone repeated in file",
+        5: "phone longer than 10",
+        6: "invalid phone",
+    }
+
+
+def test_products_types_and_minimums():
+    accepted, rejected = validate_rows("products_raw", _file(
+        "product_name,category,selling_price,cost_price,stock\n"
+        "Pen,Office,10.555,5,3\n"
+        "Widget,Tools,5,1,\n"
+        "Cup,Home,0,1,1\n"
+        "Mug,Home,5,abc,1\n"
+        "Lamp,Home,5,1,2.5\n"
+        "Cafe Mug,Home,5,1,1\n"
+        "CAFÉ MUG,Home,6,1,1\n"
+    ))
+    assert accepted["selling_price"].tolist() == [10.56, 5.0]
+    assert accepted["stock"].dtype == "Int64"
+    assert _reasons(rejected) == {
+        3: "product_name already exists",
+        4: "selling_price below 0.01",
+        5: "invalid cost_price",
+        6: "invalid stock",
+        8: "product_name repeated in file",
+    }
+
+
+def test_orders_choices_defaults_and_references():
+    accepted, rejected = validate_rows("orders_raw", _file(
+        "customer_id,product_id,quantity,payment_method,order_status\n"
+        "1,2,3,upi,\n"
+        "1,7,1,UPI,Shipped\n"
+        "2,1,1,Cheque,\n"
+    ))
+    assert accepted[["payment_method", "order_status"]].values.tolist() == [["UPI", "Pending"]]
+    assert _reasons(rejected) == {3: "unknown product_id", 4: "invalid payment_method"}
+
+
+def test_dates_are_iso_or_day_first():
+    accepted, rejected = validate_rows("customers_raw", _file(
+        "customer_name,phone,created_at\n"
+        "A,1,2024-03-04 10:00\n"
+        "B,2,01/02/2024\n"
+        "C,3,25/12/2024\n"
+        "D,4,31/13/2024\n"
+    ))
+    assert accepted["created_at"].tolist() == [pd.Timestamp("2024-03-04 10:00"),
+                                               pd.Timestamp("2024-02-01"),
+                                               pd.Timestamp("2024-12-25")]
+    assert _reasons(rejected) == {5: "invalid created_at"}
+
+
+def test_ambiguous_dates_rejected_without_day_first_evidence():
+    _, rejected = validate_rows("customers_raw", _file(
+        "customer_name,phone,created_at\nA,1,01/02/2024\nB,2,05/05/2024\n"
+    ))
+    assert _reasons(rejected) == {2: "ambiguous created_at, use YYYY-MM-DD"}
+
+
+def test_missing_required_column():
+    with pytest.raises(ValueError, match="phone"):
+        validate_rows("customers_raw", _file("customer_name\nA\n"))
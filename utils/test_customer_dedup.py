@@ -0,0 +1,69 @@
+import pandas as pd
+import pytest
+from utils.customer_dedup import find_duplicate_groups, normalize_emails, normalize_phones, soundex
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("+91 98765-43210", "9876543210"),
+    ("098765 43210", "9876543210"),
+    ("91 9876543210", "9876543210"),
+    ("(987) 654-3210", "9876543210"),
+    ("9176543210", "9176543210"),   # 10 digits starting with 91 is not a country code
+    ("12345", "12345"),
+    (None, ""),
+])
+def test_normalize_phones(raw, expected):
+    assert normalize_phones([raw]).tolist() == [expected]
+
+
+def test_normalize_emails_blanks_placeholders():
+    assert normalize_emails([" A@X.com ", "unknown", None, "None"]).tolist() == ["a@x.com", "", "", ""]
+
+
+@pytest.mark.parametrize("name, code", [
+    ("Robert", "R163"),
+    ("Rupert", "R163"),
+    ("Ashcraft", "A261"),   # h does not separate s and c
+    ("Tymczak", "T522"),
+    ("Pfister", "P236"),
+    ("Lee", "L000"),
+    ("123", ""),
+])
+def test_soundex(name, code):
+    assert soundex(name) == code
+
+
+def _customers(rows):
+    return pd.DataFrame(rows, columns=["customer_id", "customer_name", "email", "phone"])
+
+
+def _clusters(df):
+    return dict(zip(df["customer_id"], df["canonical_id"]))
+
+
+def test_exact_phone_and_email_matches_merge_to_lowest_id():
+    df = find_duplicate_groups(_customers([
+        (3, "Asha Rao", "asha@x.com", "+91 98765 43210"),
+        (1, "A. Rao", "other@y.com", "9876543210"),
+        (2, "Someone Else", "ASHA@x.com", "9000000000"),
+    ]))
+    assert _clusters(df) == {3: 1, 1: 1, 2: 1}
+
+
+def test_fuzzy_match_needs_similar_name_and_shared_key():
+    df = find_duplicate_groups(_customers([
+        (1, "Rahul Sharma", "", "9876543210"),
+        (2, "Rahul Sharmaa", "", "9876543211"),   # one-digit phone typo
+        (3, "Rahul Verma", "", "9876543212"),     # name too different
+        (4, "Priya Nair", "", "9123456789"),
+    ]))
+    assert _clusters(df) == {1: 1, 2: 1, 3: 3, 4: 4}
+
+
+def test_unrelated_rows_stay_apart():
+    df = find_duplicate_groups(_customers([
+        (1, "Rahul Sharma", "rahul@x.com", "9876543210"),
+        (2, "Priya Nair", "priya@y.com", "9123456789"),
+    ]))
+    assert _clusters(df) == {1: 1, 2: 2}
+    assert df["phone_norm"].tolist() == ["9876543210", "9123456789"]
@@ -0,0 +1,28 @@
+import math
+import pytest
+from utils.price_normalization import normalize_prices
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("₹1,234.50", 1234.5),
+    ("Rs. 1,23,456", 123456.0),
+    ("1.234,50 €", 1234.5),
+    ("1 234,50", 1234.5),
+    ("12,5", 12.5),
+    ("1,234", 1234.0),
+    ("1.234.567", 1234567.0),
+    ("$ 99", 99.0),
+    ("INR 10.10", 10.1),
+    (42, 42.0),
+])
+def test_parses_price_formats(raw, expected):
+    prices, failed = normalize_prices([raw])
+    assert prices.tolist() == [expected]
+    assert not failed.iat[0]
+
+
+@pytest.mark.parametrize("raw", ["abc", None, ""])
+def test_unparsable_prices_fail(raw):
+    prices, failed = normalize_prices([raw])
+    assert math.isnan(prices.iat[0])
+    assert failed.iat[0]
@@ -0,0 +1,23 @@
+# utils/type_conversion.py
+import pandas as pd
+import numpy as np
+
+# ----------------------------
+# Helper: convert numpy/pandas types to native Python types
+# ----------------------------
+def to_python(val):
+    """Convert numpy/pandas numeric types and pd.NA to native Python types."""
+    if val is None:
+        return None
+    # pandas NA
+    try:
+        if pd.isna(val):
+            return None
+    except Exception:
+        pass
+    if isinstance(val, (np.integer,)):
+        return int(val)
+    if isinstance(val, (np.floating,)):
+        return float(val)
+    # regular python int/float/str remain
+    return val
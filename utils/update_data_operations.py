@@ -1,33 +1,17 @@
 # utils/update_data_operations.py
 from mysql.connector import Error
 from utils.database_connection import create_connection
-import pandas as pd
-import numpy as np
-
-# ----------------------------
-# Helper: convert numpy/pandas types to native Python types
-# ----------------------------
-def to_python(val):
-    """Convert numpy/pandas numeric types and pd.NA to native Python types."""
-    if val is None:
-        return None
-    # pandas NA
-    try:
-        if pd.isna(val):
-            return None
-    except Exception:
-        pass
-    if isinstance(val, (np.integer,)):
-        return int(val)
-    if isinstance(val, (np.floating,)):
-        return float(val)
-    # regular python int/float/str remain
-    return val
+from utils.natural_key_index import invalidate_index
+from utils.query_cache import invalidates
+from utils.type_conversion import to_python
 
 # ----------------------------
 # RAW TABLE UPDATION FUNCTIONS
+# Edited raw rows are flagged is_cleaned=0 so the next incremental
+# preprocessing run normalizes them again.
 # ----------------------------
 
+@invalidates("customers_raw")
 def update_customer_raw(c_id, c_name, c_email, c_phone, c_city):
     # convert inputs to native Python types
     c_id = to_python(c_id)
@@ -42,12 +26,13 @@ def update_customer_raw(c_id, c_name, c_email, c_phone, c_city):
         cursor.execute(
             """
             UPDATE customers_raw
-            SET customer_name=%s, email=%s, phone=%s, city=%s
+            SET customer_name=%s, email=%s, phone=%s, city=%s, is_cleaned=0
             WHERE customer_id=%s
             """,
             (c_name, c_email, c_phone, c_city, c_id),
         )
         conn.commit()
+        invalidate_index("customers_raw")
         return {"status": "success", "message": "Customer (raw) updated successfully"}
     except Error as e:
         return {"status": "error", "message": str(e)}
@@ -55,6 +40,7 @@ def update_customer_raw(c_id, c_name, c_email, c_phone, c_city):
         cursor.close()
         conn.close()
 
+@invalidates("products_raw", "sales_raw")
 def update_product_raw(p_id, p_name, p_category, p_sp, p_cp, p_stock):
     p_id = to_python(p_id)
     p_name = None if p_name is None else str(p_name).strip()
@@ -69,7 +55,7 @@ def update_product_raw(p_id, p_name, p_category, p_sp, p_cp, p_stock):
         cursor.execute(
             """
             UPDATE products_raw
-            SET product_name=%s, category=%s, selling_price=%s, cost_price=%s, stock=%s
+            SET product_name=%s, category=%s, selling_price=%s, cost_price=%s, stock=%s, is_cleaned=0
             WHERE product_id=%s
             """,
             (p_name, p_category, p_sp, p_cp, p_stock, p_id),
@@ -102,6 +88,7 @@ def update_product_raw(p_id, p_name, p_category, p_sp, p_cp, p_stock):
                 )
 
         conn.commit()
+        invalidate_index("products_raw")
         return {"status": "success", "message": "Product (raw) updated successfully"}
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -109,6 +96,7 @@ def update_product_raw(p_id, p_name, p_category, p_sp, p_cp, p_stock):
         cursor.close()
         conn.close()
 
+@invalidates("orders_raw", "sales_raw")
 def update_order_raw(o_id, o_quantity, o_status, o_payment_method):
     o_id = to_python(o_id)
     o_quantity = to_python(o_quantity) or 0
@@ -163,6 +151,7 @@ def update_order_raw(o_id, o_quantity, o_status, o_payment_method):
         cursor.close()
         conn.close()
 
+@invalidates("sales_raw")
 def update_sale_raw(s_id, s_region):
     s_id = to_python(s_id)
     s_region = None if s_region is None or str(s_region).strip() == "" else str(s_region).strip()
@@ -171,7 +160,7 @@ def update_sale_raw(s_id, s_region):
     cursor = conn.cursor(dictionary=True)
     try:
         cursor.execute(
-            "UPDATE sales_raw SET region=%s WHERE sale_id=%s",
+            "UPDATE sales_raw SET region=%s, is_cleaned=0 WHERE sale_id=%s",
             (s_region, s_id),
         )
         conn.commit()
@@ -186,6 +175,7 @@ def update_sale_raw(s_id, s_region):
 # MAIN TABLES UPDATION FUNCTIONS
 # ----------------------------
 
+@invalidates("customers")
 def update_customer_main(c_id, c_name, c_email, c_city):
     c_id = to_python(c_id)
     c_name = None if c_name is None else str(c_name).strip()
@@ -211,6 +201,7 @@ def update_customer_main(c_id, c_name, c_email, c_city):
         cursor.close()
         conn.close()
 
+@invalidates("products", "sales")
 def update_product_main(p_id, p_sp, p_cp, p_stock):
     p_id = to_python(p_id)
     p_sp = to_python(p_sp)
@@ -255,6 +246,7 @@ def update_product_main(p_id, p_sp, p_cp, p_stock):
         cursor.close()
         conn.close()
 
+@invalidates("orders")
 def update_order_main(o_id, o_status, o_payment_method):
     o_id = to_python(o_id)
     o_status = None if o_status is None else str(o_status).strip()
@@ -279,6 +271,7 @@ def update_order_main(o_id, o_status, o_payment_method):
         cursor.close()
         conn.close()
 
+@invalidates("sales")
 def update_sale_main(s_id, s_region):
     s_id = to_python(s_id)
     s_region = None if s_region is None or str(s_region).strip() == "" else str(s_region).strip()
@@ -1,4 +1,4 @@
-from utils.database_connection import create_connection
+from utils.database_connection import create_connection, release_connection
 from mysql.connector import Error
 
 def view_all_tables():
@@ -47,10 +47,9 @@ def view_all_tables():
         print(f" Error while fetching tables: {e}")
 
     finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
-            print("Connection closed.")
+        cursor.close()
+        release_connection(conn)
+        print("Connection closed.")
 
 if __name__ == "__main__":
     view_all_tables()